@@ -1,14 +1,35 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session, flash, send_from_directory
-from datetime import datetime
+from flask import Flask, render_template, request, jsonify, redirect, url_for, session, flash, send_from_directory, send_file, abort, make_response
+from datetime import datetime, date
 import os
 import hashlib
 import secrets
 import re
 import tempfile
+import multiprocessing
+import math
+import sqlite3
+import calendar
+import click
 import requests
+import threading
+import time
+import json
+import gzip
+import shutil
+import mimetypes
+import difflib
+import unicodedata
 from dotenv import load_dotenv
-from supabase import create_client, Client
-from functools import wraps
+from functools import wraps, lru_cache
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeout
+from concurrent.futures.process import BrokenProcessPool
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+from markupsafe import Markup, escape
+from werkzeug.security import safe_join
+from ocr_worker import ocr_texto_pagina
 
 # Carrega o .env sempre a partir da pasta do próprio app.py
 _BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -26,26 +47,350 @@ TABLE_TRANSACOES  = f"{TABLE_PREFIX}transacoes"
 TABLE_LISTAS      = f"{TABLE_PREFIX}listas_compras"
 TABLE_ITENS       = f"{TABLE_PREFIX}itens_lista"
 TABLE_USUARIOS    = f"{TABLE_PREFIX}usuarios"
+TABLE_CATALOGO    = f"{TABLE_PREFIX}catalogo_itens"
+TABLE_RECORRENCIAS = f"{TABLE_PREFIX}recorrencias"
+TABLE_CONCILIACAO = f"{TABLE_PREFIX}conciliacao"
+TABLE_CONCILIACAO_CURSOR = f"{TABLE_PREFIX}conciliacao_cursor"
+
+# O cliente é criado sob demanda (primeiro uso) e reaproveitado por processo.
+# O import do pacote `supabase` é pesado, então só é pago por workers que
+# realmente acessam o banco. O PID guardado garante que, após um fork do
+# gunicorn (modo preload), cada worker crie o seu próprio cliente HTTP.
+_supabase_client = None
+_supabase_pid = None
+_supabase_lock = threading.Lock()
 
-supabase: Client = None
-
-# Inicializa imediatamente ao carregar o módulo
 def init_supabase():
-    global supabase
+    global _supabase_client, _supabase_pid
     url = os.getenv('SUPABASE_URL')
     key = os.getenv('SUPABASE_KEY')
+    client = None
     if not url or not key:
         print("ERRO: SUPABASE_URL e SUPABASE_KEY não encontrados no .env")
-        return False
-    try:
-        supabase = create_client(supabase_url=url, supabase_key=key)
-        return True
-    except Exception as e:
-        print(f"Erro ao conectar ao Supabase: {e}")
-        return False
+    else:
+        try:
+            from supabase import create_client
+            client = create_client(supabase_url=url, supabase_key=key)
+        except Exception as e:
+            print(f"Erro ao conectar ao Supabase: {e}")
+    # O PID é publicado por último: leitores sem lock só veem o estado pronto.
+    _supabase_client = client
+    _supabase_pid = os.getpid()
+    return client is not None
+
+def get_supabase():
+    if _supabase_pid == os.getpid():
+        return _supabase_client
+    with _supabase_lock:
+        if _supabase_pid != os.getpid():
+            init_supabase()
+    return _supabase_client
+
+def preaquecer():
+    """Carrega no processo mestre o que pode ser compartilhado entre workers."""
+    import supabase  # noqa: F401  (apenas aquece o cache de módulos)
+    for nome in app.jinja_env.list_templates():
+        app.jinja_env.get_template(nome)
+
+# ============================================================
+# CACHE LOCAL (por worker)
+# ============================================================
+class CacheLocal:
+    """LRU em memória com TTL, compartilhado pelas threads do worker."""
+
+    def __init__(self, max_itens=4096, ttl=3600):
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self._dados = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, chave, default=None):
+        with self._lock:
+            item = self._dados.get(chave)
+            if item is None:
+                return default
+            valor, expira = item
+            if expira < time.monotonic():
+                del self._dados[chave]
+                return default
+            self._dados.move_to_end(chave)
+            return valor
+
+    def set(self, chave, valor, ttl=None):
+        expira = time.monotonic() + (ttl or self.ttl)
+        with self._lock:
+            self._dados[chave] = (valor, expira)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.max_itens:
+                self._dados.popitem(last=False)
+
+    def delete(self, chave):
+        with self._lock:
+            self._dados.pop(chave, None)
+
+cache_local = CacheLocal(max_itens=int(os.getenv('CACHE_LOCAL_MAX_ITENS', '4096')))
 
-# Chamar imediatamente ao iniciar o módulo
-init_supabase()
+
+# ============================================================
+# LIMITE DE TAXA (token bucket) E CONTROLE DE ADMISSÃO
+# ============================================================
+# Cada política tem um balde por usuário e um global: `capacidade` fichas,
+# repostas à razão de `por_minuto`. Por padrão os baldes ficam na memória do
+# worker; com RATE_LIMIT_STORE=/caminho/limites.db eles ficam num SQLite
+# local, compartilhado pelos workers do mesmo servidor. O mesmo armazenamento
+# guarda as vagas do controle de admissão (requisições em andamento).
+_LIMITES = {
+    'ocr':      {'usuario': (3, 6),  'global': (20, 60)},
+    'whatsapp': {'usuario': (5, 10), 'global': (30, 120)},
+}
+
+def _calcular_bucket(tokens, atualizado, capacidade, por_minuto, agora):
+    """Devolve (fichas após reposição, segundos até haver 1 ficha)."""
+    taxa = por_minuto / 60.0
+    if tokens is None:
+        tokens = float(capacidade)
+    else:
+        tokens = min(float(capacidade), tokens + (agora - atualizado) * taxa)
+    espera = 0.0 if tokens >= 1 else (1 - tokens) / taxa
+    return tokens, espera
+
+class LimitadorMemoria:
+    nome = 'memoria'
+
+    def __init__(self, relogio=time.monotonic):
+        self._relogio = relogio
+        self._baldes = {}
+        self._vagas = {}
+        self._lock = threading.Lock()
+
+    def consumir(self, regras):
+        """Consome 1 ficha de cada balde, só se todos tiverem saldo."""
+        agora = self._relogio()
+        with self._lock:
+            calculados = []
+            for chave, capacidade, por_minuto in regras:
+                tokens, atualizado = self._baldes.get(chave, (None, agora))
+                tokens, espera = _calcular_bucket(tokens, atualizado, capacidade, por_minuto, agora)
+                calculados.append((chave, tokens, espera))
+            espera = max(e for _, _, e in calculados)
+            for chave, tokens, _ in calculados:
+                self._baldes[chave] = (tokens - 1 if espera == 0 else tokens, agora)
+        return espera == 0, espera
+
+    def ocupar(self, chave, vagas, validade):
+        """Reserva uma das `vagas`; devolve a ficha ou None se estão todas ocupadas."""
+        with self._lock:
+            ocupadas = self._vagas.get(chave, 0)
+            if ocupadas >= vagas:
+                return None
+            self._vagas[chave] = ocupadas + 1
+        return chave
+
+    def liberar(self, chave, ficha):
+        with self._lock:
+            self._vagas[chave] -= 1
+
+class LimitadorSQLite:
+    nome = 'sqlite'
+
+    def __init__(self, caminho, relogio=time.time):
+        self.caminho = caminho
+        self._relogio = relogio
+        self._local = threading.local()
+
+    def _conexao(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.caminho, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS baldes '
+                '(chave TEXT PRIMARY KEY, tokens REAL NOT NULL, atualizado REAL NOT NULL)'
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS vagas '
+                '(ficha TEXT PRIMARY KEY, chave TEXT NOT NULL, expira REAL NOT NULL)'
+            )
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def consumir(self, regras):
+        conn = self._conexao()
+        agora = self._relogio()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            calculados = []
+            for chave, capacidade, por_minuto in regras:
+                row = conn.execute(
+                    'SELECT tokens, atualizado FROM baldes WHERE chave = ?', (chave,)
+                ).fetchone()
+                tokens, atualizado = row if row else (None, agora)
+                tokens, espera = _calcular_bucket(tokens, atualizado, capacidade, por_minuto, agora)
+                calculados.append((chave, tokens, espera))
+            espera = max(e for _, _, e in calculados)
+            conn.executemany(
+                'INSERT OR REPLACE INTO baldes (chave, tokens, atualizado) VALUES (?, ?, ?)',
+                [(chave, tokens - 1 if espera == 0 else tokens, agora) for chave, tokens, _ in calculados]
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return espera == 0, espera
+
+    def ocupar(self, chave, vagas, validade):
+        # A vaga de um worker que morreu no meio da requisição expira sozinha.
+        conn = self._conexao()
+        agora = self._relogio()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('DELETE FROM vagas WHERE chave = ? AND expira < ?', (chave, agora))
+            ocupadas, = conn.execute('SELECT COUNT(*) FROM vagas WHERE chave = ?', (chave,)).fetchone()
+            ficha = None
+            if ocupadas < vagas:
+                ficha = secrets.token_hex(8)
+                conn.execute(
+                    'INSERT INTO vagas (ficha, chave, expira) VALUES (?, ?, ?)',
+                    (ficha, chave, agora + validade)
+                )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return ficha
+
+    def liberar(self, chave, ficha):
+        self._conexao().execute('DELETE FROM vagas WHERE ficha = ?', (ficha,))
+
+_limitador = (
+    LimitadorSQLite(os.getenv('RATE_LIMIT_STORE')) if os.getenv('RATE_LIMIT_STORE')
+    else LimitadorMemoria()
+)
+_metricas_limites = {}
+_metricas_lock = threading.Lock()
+
+def _contar_metrica(politica, resultado):
+    with _metricas_lock:
+        por_politica = _metricas_limites.setdefault(politica, {})
+        por_politica[resultado] = por_politica.get(resultado, 0) + 1
+
+def _resposta_limite(espera, mensagem):
+    """429 com Retry-After; formulários voltam para a página de origem."""
+    retry_after = max(1, math.ceil(espera))
+    if request.accept_mimetypes.best == 'application/json':
+        response = jsonify({'erro': mensagem, 'retry_after': retry_after})
+    else:
+        flash(mensagem, 'warning')
+        destino = escape(request.referrer or url_for('index'))
+        response = make_response(
+            f'<meta http-equiv="refresh" content="0;url={destino}"><a href="{destino}">Voltar</a>'
+        )
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+def limitar_taxa(politica):
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            limites = _LIMITES[politica]
+            regras = [
+                (f"{politica}:u:{session.get('user_id')}", *limites['usuario']),
+                (f'{politica}:global', *limites['global']),
+            ]
+            permitido, espera = _limitador.consumir(regras)
+            if not permitido:
+                _contar_metrica(politica, 'limitado')
+                return _resposta_limite(
+                    espera, f'Muitas solicitacoes. Tente novamente em {max(1, math.ceil(espera))} s.'
+                )
+            _contar_metrica(politica, 'permitido')
+            return f(*args, **kwargs)
+        return decorated
+    return decorator
+
+def controlar_admissao(politica, vagas, espera_sugerida, validade):
+    """Recusa com 429 quando já há `vagas` requisições da política em andamento.
+
+    Com RATE_LIMIT_STORE a contagem vale para todos os workers do servidor;
+    na memória ela é por worker e só enche com workers de várias threads.
+    `validade` (segundos) libera a vaga de um worker que morreu sem devolvê-la.
+    """
+    chave = f'{politica}:admissao'
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            ficha = _limitador.ocupar(chave, vagas, validade)
+            if ficha is None:
+                _contar_metrica(politica, 'sem_vaga')
+                return _resposta_limite(
+                    espera_sugerida, 'Servidor ocupado processando outras notas. Tente novamente em instantes.'
+                )
+            try:
+                return f(*args, **kwargs)
+            finally:
+                _limitador.liberar(chave, ficha)
+        return decorated
+    return decorator
+
+
+# ============================================================
+# TEMPLATES: cache de fragmentos e de bytecode
+# ============================================================
+class FragmentCacheExtension(Extension):
+    """`{% cache 'conta', conta.id, conta.saldo %}...{% endcache %}`.
+
+    A chave deve conter o id da entidade e tudo o que muda o fragmento
+    (a "versão"); o HTML renderizado fica no cache_local.
+    """
+    tags = {'cache'}
+    # Entra na chave do cache de bytecode: incremente ao mudar parse().
+    versao = 1
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        partes = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            partes.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        origem = nodes.Const(f'{parser.name}:{lineno}')
+        return nodes.CallBlock(
+            self.call_method('_renderizar', [origem, nodes.List(partes)]), [], [], body
+        ).set_lineno(lineno)
+
+    def _renderizar(self, origem, partes, caller):
+        chave = 'frag:' + hashlib.sha1(repr((origem, partes)).encode()).hexdigest()
+        html = cache_local.get(chave)
+        if html is None:
+            html = Markup(caller())
+            cache_local.set(chave, html)
+        return html
+
+class BytecodeCacheApp(FileSystemBytecodeCache):
+    """Cache de bytecode que cria o diretório só na primeira gravação.
+
+    O bytecode guarda a saída do parse() das extensões, que a checagem do
+    fonte do template não cobre; a versão delas entra na chave.
+    """
+
+    def get_cache_key(self, name, filename=None):
+        versoes = ','.join(
+            f'{nome}={getattr(ext, "versao", 0)}'
+            for nome, ext in sorted(app.jinja_env.extensions.items())
+        )
+        return super().get_cache_key(f'{name}|{versoes}', filename)
+
+    def dump_bytecode(self, bucket):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+        except OSError:
+            return  # sistema de arquivos somente leitura: segue sem cache
+        super().dump_bytecode(bucket)
+
+# Bytecode persistente: workers novos carregam os templates já compilados.
+_JINJA_CACHE_DIR = os.path.join(_BASE_DIR, 'build', 'jinja-cache')
+app.jinja_env.bytecode_cache = BytecodeCacheApp(_JINJA_CACHE_DIR)
+app.jinja_env.add_extension(FragmentCacheExtension)
 
 # ============================================================
 # EVOLUTION API (WHATSAPP)
@@ -72,8 +417,50 @@ def get_evolution_config():
 def normalizar_numero_whatsapp(numero):
     return ''.join(ch for ch in (numero or '') if ch.isdigit())
 
+# ============================================================
+# DINHEIRO (centavos inteiros)
+# ============================================================
+# Valores monetários viram centavos (int) uma única vez, ao sair do banco ou
+# do formulário; somas e comparações usam aritmética inteira, sem erro de
+# arredondamento acumulado. Para gravar (NUMERIC(10,2)) ou devolver em JSON
+# usa-se reais(); a formatação passa por _formatar_centavos, com cache.
+_UM_CENTAVO = Decimal('1')
+
+def centavos(valor):
+    if valor is None or valor == '':
+        return 0
+    if isinstance(valor, int):
+        return valor * 100
+    try:
+        return int((Decimal(str(valor).strip()) * 100).quantize(_UM_CENTAVO, rounding=ROUND_HALF_UP))
+    except InvalidOperation as e:
+        raise ValueError(f'Valor monetario invalido: {valor!r}') from e
+
+def reais(valor_centavos):
+    return valor_centavos / 100
+
+def com_centavos(linhas, *campos):
+    """Acrescenta `<campo>_centavos` às linhas lidas do banco."""
+    for linha in linhas:
+        for campo in campos:
+            linha[f'{campo}_centavos'] = centavos(linha.get(campo))
+    return linhas
+
+@lru_cache(maxsize=8192)
+def _formatar_centavos(valor_centavos, separador='.'):
+    sinal = '-' if valor_centavos < 0 else ''
+    inteiro, resto = divmod(abs(valor_centavos), 100)
+    return f'{sinal}{inteiro}{separador}{resto:02d}'
+
+def formatar_moeda(valor_centavos):
+    return 'R$ ' + _formatar_centavos(valor_centavos, ',')
+
 def moeda_br(valor):
-    return f"R$ {float(valor):.2f}".replace('.', ',')
+    return formatar_moeda(centavos(valor))
+
+@app.template_filter('reais')
+def filtro_reais(valor_centavos):
+    return _formatar_centavos(valor_centavos)
 
 def _limpar_linha_ocr(linha):
     texto = (linha or '').strip()
@@ -83,12 +470,52 @@ def _limpar_linha_ocr(linha):
 def _parse_br_number(raw_value):
     value = (raw_value or '').strip()
     value = value.replace('R$', '').replace(' ', '')
+    # "15.90" (ponto decimal, sem vírgula) não é separador de milhar.
+    if ',' not in value and re.fullmatch(r'\d+\.\d{2}', value):
+        return float(value)
     value = value.replace('.', '').replace(',', '.')
     try:
         return float(value)
     except ValueError:
         return None
 
+_PATTERN_QTD_X_UNIT_TOTAL = re.compile(
+    r'^(?P<descricao>.+?)\s+(?P<qtd>\d+[.,]?\d*)\s*[xX]\s*(?P<unit>\d+[.,]\d{2})\s+(?P<total>\d+[.,]\d{2})$'
+)
+_PATTERN_QTD_X_UNIT = re.compile(
+    r'^(?P<descricao>.+?)\s+(?P<qtd>\d+[.,]?\d*)\s*[xX]\s*(?P<unit>\d+[.,]\d{2})$'
+)
+_PATTERN_DESC_TOTAL = re.compile(
+    r'^(?P<descricao>[\w\s\-\.,/%\(\)]+?)\s+(?P<total>\d+(?:\.\d{3})*[.,]\d{2})$'
+)
+
+def _parse_linha_item(line):
+    """Reconhece "descricao qtd x unit [total]" ou "descricao total"."""
+    for pattern in (_PATTERN_QTD_X_UNIT_TOTAL, _PATTERN_QTD_X_UNIT):
+        m = pattern.match(line)
+        if m:
+            descricao = m.group('descricao').strip(' -')
+            qtd = _parse_br_number(m.group('qtd')) or 1.0
+            unit = _parse_br_number(m.group('unit'))
+            if descricao and unit and qtd > 0:
+                return {
+                    'descricao': descricao[:120],
+                    'quantidade': int(round(qtd)) if qtd >= 1 else 1,
+                    'valor': float(unit)
+                }
+
+    m = _PATTERN_DESC_TOTAL.match(line)
+    if m:
+        descricao = m.group('descricao').strip(' -')
+        total = _parse_br_number(m.group('total'))
+        if descricao and total and total > 0:
+            return {
+                'descricao': descricao[:120],
+                'quantidade': 1,
+                'valor': float(total)
+            }
+    return None
+
 def _extrair_itens_nota_por_texto(raw_text):
     itens = []
     ignorar = (
@@ -98,16 +525,6 @@ def _extrair_itens_nota_por_texto(raw_text):
         'coo', 'operador', 'caixa'
     )
 
-    pattern_qtd_x_unit_total = re.compile(
-        r'^(?P<descricao>.+?)\s+(?P<qtd>\d+[.,]?\d*)\s*[xX]\s*(?P<unit>\d+[.,]\d{2})\s+(?P<total>\d+[.,]\d{2})$'
-    )
-    pattern_qtd_x_unit = re.compile(
-        r'^(?P<descricao>.+?)\s+(?P<qtd>\d+[.,]?\d*)\s*[xX]\s*(?P<unit>\d+[.,]\d{2})$'
-    )
-    pattern_desc_total = re.compile(
-        r'^(?P<descricao>[A-Za-z0-9\s\-\.,/%\(\)]+?)\s+(?P<total>\d+[.,]\d{2})$'
-    )
-
     for raw_line in (raw_text or '').splitlines():
         line = _limpar_linha_ocr(raw_line)
         if len(line) < 4:
@@ -120,45 +537,7 @@ def _extrair_itens_nota_por_texto(raw_text):
         if sum(ch.isdigit() for ch in line) < 2:
             continue
 
-        item = None
-
-        m = pattern_qtd_x_unit_total.match(line)
-        if m:
-            descricao = m.group('descricao').strip(' -')
-            qtd = _parse_br_number(m.group('qtd')) or 1.0
-            unit = _parse_br_number(m.group('unit'))
-            if descricao and unit and qtd > 0:
-                item = {
-                    'descricao': descricao[:120],
-                    'quantidade': int(round(qtd)) if qtd >= 1 else 1,
-                    'valor': float(unit)
-                }
-
-        if item is None:
-            m = pattern_qtd_x_unit.match(line)
-            if m:
-                descricao = m.group('descricao').strip(' -')
-                qtd = _parse_br_number(m.group('qtd')) or 1.0
-                unit = _parse_br_number(m.group('unit'))
-                if descricao and unit and qtd > 0:
-                    item = {
-                        'descricao': descricao[:120],
-                        'quantidade': int(round(qtd)) if qtd >= 1 else 1,
-                        'valor': float(unit)
-                    }
-
-        if item is None:
-            m = pattern_desc_total.match(line)
-            if m:
-                descricao = m.group('descricao').strip(' -')
-                total = _parse_br_number(m.group('total'))
-                if descricao and total and total > 0:
-                    item = {
-                        'descricao': descricao[:120],
-                        'quantidade': 1,
-                        'valor': float(total)
-                    }
-
+        item = _parse_linha_item(line)
         if item is None:
             continue
 
@@ -178,35 +557,293 @@ def _extrair_itens_nota_por_texto(raw_text):
 
     return dedup[:60]
 
-def _extrair_itens_por_ocr(arquivo_stream, filename):
-    try:
-        from PIL import Image, ImageOps
-        import pytesseract
-    except ImportError as e:
-        raise RuntimeError(
-            'Dependencias OCR ausentes. Instale com: pip install pillow pytesseract'
-        ) from e
+_MAX_ITENS_LOTE = 200
+_PATTERN_QTD_PREFIXO = re.compile(r'^(?P<qtd>\d+)\s*[xX]?\s+(?P<descricao>\D.*)$')
+
+def _extrair_itens_em_lote(raw_text):
+    """Interpreta texto colado (um item por linha) para inclusão em lote.
 
-    suffix = os.path.splitext(filename or '')[1].lower() or '.jpg'
-    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-        tmp.write(arquivo_stream.read())
-        tmp_path = tmp.name
+    Usa o mesmo parser da nota fiscal; linhas sem preço também são aceitas
+    ("Arroz" ou "2x Arroz") com valor zero. Retorna (itens, erros), onde
+    cada erro indica a linha de origem.
+    """
+    itens = []
+    erros = []
+    for numero, raw_line in enumerate((raw_text or '').splitlines(), start=1):
+        line = _limpar_linha_ocr(raw_line).lstrip('-*• ')
+        if not line:
+            continue
 
+        item = _parse_linha_item(line) or {'descricao': line[:120], 'quantidade': 1, 'valor': 0.0}
+        # "3x Leite 4,50": o parser da nota só vê "descricao total"; a
+        # quantidade no início da linha vale com ou sem preço.
+        m = _PATTERN_QTD_PREFIXO.match(item['descricao'])
+        if m and item['quantidade'] == 1:
+            item['descricao'] = m.group('descricao').strip()[:120]
+            item['quantidade'] = int(m.group('qtd'))
+
+        if not item['descricao']:
+            erros.append({'linha': numero, 'erro': 'Descricao vazia.'})
+        elif item['quantidade'] < 1:
+            erros.append({'linha': numero, 'erro': 'Quantidade deve ser maior que zero.'})
+        elif item['valor'] < 0:
+            erros.append({'linha': numero, 'erro': 'Valor nao pode ser negativo.'})
+        else:
+            item['linha'] = numero
+            itens.append(item)
+
+    if len(itens) > _MAX_ITENS_LOTE:
+        erros.append({'linha': None, 'erro': f'Maximo de {_MAX_ITENS_LOTE} itens por envio.'})
+    return itens, erros
+
+# ------------------------------------------------------------
+# OCR em várias páginas (fotos ou PDF)
+# Cada página vira uma tarefa num pool de processos limitado por worker;
+# o tempo total fica próximo ao da página mais lenta. A tarefa em si está
+# em ocr_worker.py, que os processos do pool importam sem carregar o app.
+# ------------------------------------------------------------
+_OCR_MAX_PROCESSOS = int(os.getenv('OCR_MAX_PROCESSOS', str(min(4, os.cpu_count() or 1))))
+_OCR_MAX_PAGINAS = int(os.getenv('OCR_MAX_PAGINAS', '10'))
+_OCR_TIMEOUT = int(os.getenv('OCR_TIMEOUT', '120'))
+# Importações simultâneas aceitas (no servidor, com RATE_LIMIT_STORE).
+_OCR_VAGAS = int(os.getenv('OCR_VAGAS', str(2 * _OCR_MAX_PROCESSOS)))
+_ocr_pool = None
+_ocr_pool_pid = None
+_ocr_pool_lock = threading.Lock()
+
+def _get_ocr_pool():
+    global _ocr_pool, _ocr_pool_pid
+    with _ocr_pool_lock:
+        if _ocr_pool is None or _ocr_pool_pid != os.getpid():
+            # "spawn": o processo filho não herda threads nem conexões do worker.
+            _ocr_pool = ProcessPoolExecutor(
+                max_workers=_OCR_MAX_PROCESSOS,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            _ocr_pool_pid = os.getpid()
+        return _ocr_pool
+
+def _descartar_ocr_pool(pool):
+    """Tira o pool de uso e encerra seus processos, inclusive tarefas em andamento."""
+    global _ocr_pool
+    with _ocr_pool_lock:
+        if _ocr_pool is pool:
+            _ocr_pool = None
+    processos = list((getattr(pool, '_processes', None) or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    # shutdown() não interrompe páginas já em OCR; sem isso elas seguiriam
+    # ocupando as vagas do pool novo.
+    for processo in processos:
+        if processo.is_alive():
+            processo.terminate()
+
+def _contar_paginas_pdf(conteudo):
     try:
-        img = Image.open(tmp_path)
-        img = ImageOps.grayscale(img)
-        texto = pytesseract.image_to_string(img, lang=os.getenv('OCR_LANG', 'por+eng'))
-    except Exception as e:
-        raise RuntimeError(f'Erro ao processar OCR da imagem: {e}') from e
+        import pypdfium2 as pdfium
+    except ImportError as e:
+        raise RuntimeError('Leitura de PDF indisponivel. Instale com: pip install pypdfium2') from e
+    pdf = pdfium.PdfDocument(conteudo)
+    try:
+        return len(pdf)
     finally:
-        try:
-            os.remove(tmp_path)
-        except OSError:
-            pass
+        pdf.close()
+
+def _mesclar_itens_paginas(paginas):
+    """Junta os itens das páginas removendo o trecho repetido na emenda.
+
+    Fotos consecutivas de um cupom longo costumam repetir as últimas linhas
+    de uma página no início da seguinte; a maior sobreposição entre o fim
+    do acumulado e o começo da página é descartada.
+    """
+    def chave(item):
+        return (item['descricao'].lower(), item['quantidade'], round(item['valor'], 2))
+
+    mesclados = []
+    for itens in paginas:
+        limite = min(len(mesclados), len(itens))
+        sobreposicao = 0
+        for n in range(limite, 0, -1):
+            if [chave(i) for i in mesclados[-n:]] == [chave(i) for i in itens[:n]]:
+                sobreposicao = n
+                break
+        mesclados.extend(itens[sobreposicao:])
+    return mesclados
+
+def _extrair_itens_por_ocr(arquivos):
+    """Recebe [(conteudo, filename), ...] e devolve os itens de todas as páginas."""
+    tarefas = []
+    for conteudo, filename in arquivos:
+        suffix = os.path.splitext(filename or '')[1].lower() or '.jpg'
+        if suffix == '.pdf':
+            tarefas.extend((conteudo, suffix, p) for p in range(_contar_paginas_pdf(conteudo)))
+        else:
+            tarefas.append((conteudo, suffix, 0))
 
-    itens = _extrair_itens_nota_por_texto(texto)
+    if len(tarefas) > _OCR_MAX_PAGINAS:
+        raise RuntimeError(f'Envie no maximo {_OCR_MAX_PAGINAS} paginas por importacao.')
+
+    for tentativa in range(2):
+        pool = _get_ocr_pool()
+        try:
+            futuros = [pool.submit(ocr_texto_pagina, *tarefa) for tarefa in tarefas]
+            textos = [f.result(timeout=_OCR_TIMEOUT) for f in futuros]
+            break
+        except BrokenProcessPool as e:
+            # Um processo do pool morreu (ex.: falta de memória): recria e
+            # tenta mais uma vez.
+            _descartar_ocr_pool(pool)
+            if tentativa:
+                raise RuntimeError('Falha no processamento do OCR. Tente novamente.') from e
+        except FuturesTimeout as e:
+            _descartar_ocr_pool(pool)
+            raise RuntimeError('Tempo esgotado ao ler a nota. Tente com menos paginas.') from e
+
+    itens = _mesclar_itens_paginas([_extrair_itens_nota_por_texto(t) for t in textos])
     if not itens:
         raise RuntimeError('Nao consegui identificar itens na nota. Tente uma foto mais nitida.')
+    return itens[:_MAX_ITENS_LOTE]
+
+# ============================================================
+# CATÁLOGO DE ITENS (autocomplete e histórico de preços)
+# ============================================================
+# O catálogo de cada usuário fica na tabela p01cf_catalogo_itens e é
+# atualizado a cada item gravado. Para sugerir itens sem ir ao banco a cada
+# tecla, o worker monta uma trie do catálogo no primeiro uso e a guarda no
+# cache_local; gravações do usuário descartam a trie.
+_CATALOGO_TTL = 300
+_CATALOGO_MAX_ITENS = 5000
+_TRIE_TOP = 10
+_TRIE_PROFUNDIDADE = 12
+
+def normalizar_descricao_item(descricao):
+    texto = unicodedata.normalize('NFKD', descricao or '')
+    texto = ''.join(ch for ch in texto if not unicodedata.combining(ch)).lower()
+    return re.sub(r'[^a-z0-9]+', ' ', texto).strip()
+
+class TrieItens:
+    """Trie de prefixos com os itens mais frequentes guardados em cada nó.
+
+    Cada item é indexado pelo início de cada palavra da chave normalizada,
+    então "int" encontra "leite integral". Os itens devem ser inseridos em
+    ordem decrescente de frequência; assim as primeiras entradas de cada nó
+    já são as melhores sugestões para aquele prefixo.
+    """
+
+    def __init__(self):
+        self._raiz = {}
+
+    def inserir(self, chave, entrada):
+        inicios = [0] + [m.end() for m in re.finditer(' ', chave)]
+        for inicio in inicios[:4]:
+            no = self._raiz
+            for pos, ch in enumerate(chave[inicio:inicio + _TRIE_PROFUNDIDADE]):
+                no = no.setdefault(ch, {})
+                top = no.setdefault('#', [])
+                ultimo_nivel = pos == _TRIE_PROFUNDIDADE - 1
+                if (len(top) < _TRIE_TOP or ultimo_nivel) and entrada not in top:
+                    top.append(entrada)
+
+    def buscar(self, prefixo, limite=_TRIE_TOP):
+        prefixo = normalizar_descricao_item(prefixo)
+        if not prefixo:
+            return []
+        no = self._raiz
+        for ch in prefixo[:_TRIE_PROFUNDIDADE]:
+            no = no.get(ch)
+            if no is None:
+                return []
+        candidatos = no.get('#', [])
+        if len(prefixo) > _TRIE_PROFUNDIDADE:
+            candidatos = [
+                e for e in candidatos
+                if e['chave'].startswith(prefixo) or f' {prefixo}' in e['chave']
+            ]
+        return candidatos[:limite]
+
+def carregar_catalogo(uid):
+    chave_cache = f'catalogo:{uid}'
+    catalogo = cache_local.get(chave_cache)
+    if catalogo is not None:
+        return catalogo
+
+    res = get_supabase().table(TABLE_CATALOGO)\
+        .select('chave,descricao,ultimo_preco,preco_min,soma_precos,ocorrencias')\
+        .eq('user_id', uid)\
+        .order('ocorrencias', desc=True)\
+        .limit(_CATALOGO_MAX_ITENS).execute()
+
+    trie = TrieItens()
+    por_chave = {}
+    for row in res.data or []:
+        ocorrencias = int(row['ocorrencias']) or 1
+        entrada = {
+            'chave': row['chave'],
+            'descricao': row['descricao'],
+            'ultimo_preco': reais(centavos(row['ultimo_preco'])),
+            'preco_min': reais(centavos(row['preco_min'])),
+            'preco_medio': reais(round(centavos(row['soma_precos']) / ocorrencias)),
+            'ocorrencias': ocorrencias
+        }
+        trie.inserir(entrada['chave'], entrada)
+        por_chave[entrada['chave']] = entrada
+
+    catalogo = {'trie': trie, 'itens': por_chave}
+    cache_local.set(chave_cache, catalogo, ttl=_CATALOGO_TTL)
+    return catalogo
+
+def registrar_no_catalogo(uid, itens):
+    """Atualiza o catálogo com itens gravados (uma chamada por lote)."""
+    agregados = {}
+    for item in itens:
+        chave = normalizar_descricao_item(item['descricao'])
+        valor = centavos(item['valor'])
+        # Itens sem preço (ex.: inclusão em lote) não entram no histórico.
+        if not chave or valor <= 0:
+            continue
+        atual = agregados.get(chave)
+        if atual is None:
+            agregados[chave] = {
+                'chave': chave, 'descricao': item['descricao'].strip(),
+                'ultimo_preco': valor, 'preco_min': valor,
+                'soma_precos': valor, 'ocorrencias': 1
+            }
+        else:
+            atual['ultimo_preco'] = valor
+            atual['preco_min'] = min(atual['preco_min'], valor)
+            atual['soma_precos'] += valor
+            atual['ocorrencias'] += 1
+
+    if not agregados:
+        return
+    for atual in agregados.values():
+        for campo in ('ultimo_preco', 'preco_min', 'soma_precos'):
+            atual[campo] = reais(atual[campo])
+    try:
+        get_supabase().rpc('p01cf_catalogo_registrar', {
+            'p_user_id': uid, 'p_itens': list(agregados.values())
+        }).execute()
+    except Exception as e:
+        print(f"Aviso: catalogo de itens nao atualizado: {e}")
+    cache_local.delete(f'catalogo:{uid}')
+
+def corrigir_descricoes_ocr(uid, itens, corte=0.82):
+    """Troca descrições ruidosas do OCR pela forma já usada no catálogo."""
+    try:
+        catalogo = carregar_catalogo(uid)
+    except Exception:
+        return itens
+    chaves = list(catalogo['itens'])
+    if not chaves:
+        return itens
+
+    for item in itens:
+        chave = normalizar_descricao_item(item['descricao'])
+        if chave in catalogo['itens']:
+            item['descricao'] = catalogo['itens'][chave]['descricao']
+            continue
+        parecidas = difflib.get_close_matches(chave, chaves, n=1, cutoff=corte)
+        if parecidas:
+            item['descricao'] = catalogo['itens'][parecidas[0]]['descricao']
     return itens
 
 def enviar_texto_whatsapp(numero, mensagem):
@@ -233,18 +870,19 @@ def enviar_texto_whatsapp(numero, mensagem):
         raise RuntimeError(f"Evolution API {response.status_code}: {response.text[:250]}")
 
 def montar_relatorio_geral(user_id):
-    contas = supabase.table(TABLE_CONTAS)\
+    contas = get_supabase().table(TABLE_CONTAS)\
         .select('id,nome,banco,categoria,saldo')\
         .eq('user_id', user_id)\
+        .eq('arquivada', False)\
         .order('categoria').order('nome').execute()
 
-    contas_data = contas.data or []
-    total = sum(float(c['saldo']) for c in contas_data)
+    contas_data = com_centavos(contas.data or [], 'saldo')
+    total = sum(c['saldo_centavos'] for c in contas_data)
 
     linhas = [
         '*Relatorio Financeiro (Geral)*',
         f"Data: {datetime.now().strftime('%d/%m/%Y %H:%M')}",
-        f"Total geral: {moeda_br(total)}",
+        f"Total geral: {formatar_moeda(total)}",
         f"Qtd. contas: {len(contas_data)}",
         ''
     ]
@@ -255,13 +893,13 @@ def montar_relatorio_geral(user_id):
         linhas.append('*Contas:*')
         for conta in contas_data:
             linhas.append(
-                f"- {conta['nome']} ({conta['banco']}) [{conta['categoria']}]: {moeda_br(conta['saldo'])}"
+                f"- {conta['nome']} ({conta['banco']}) [{conta['categoria']}]: {formatar_moeda(conta['saldo_centavos'])}"
             )
 
     return '\n'.join(linhas)
 
 def montar_relatorio_conta(user_id, conta_id):
-    conta = supabase.table(TABLE_CONTAS)\
+    conta = get_supabase().table(TABLE_CONTAS)\
         .select('*').eq('id', conta_id)\
         .eq('user_id', user_id)\
         .single().execute()
@@ -269,13 +907,13 @@ def montar_relatorio_conta(user_id, conta_id):
     if not conta.data:
         raise ValueError('Conta nao encontrada.')
 
-    transacoes = supabase.table(TABLE_TRANSACOES)\
+    transacoes = get_supabase().table(TABLE_TRANSACOES)\
         .select('*').eq('conta_id', conta_id)\
         .order('data', desc=True).limit(10).execute()
 
-    trans_data = transacoes.data or []
-    entradas = sum(float(t['valor']) for t in trans_data if t['tipo'] == 'entrada')
-    saidas = sum(float(t['valor']) for t in trans_data if t['tipo'] == 'saida')
+    trans_data = com_centavos(transacoes.data or [], 'valor')
+    entradas = sum(t['valor_centavos'] for t in trans_data if t['tipo'] == 'entrada')
+    saidas = sum(t['valor_centavos'] for t in trans_data if t['tipo'] == 'saida')
 
     linhas = [
         '*Relatorio Financeiro (Conta)*',
@@ -284,7 +922,7 @@ def montar_relatorio_conta(user_id, conta_id):
         f"Banco: {conta.data['banco']}",
         f"Categoria: {conta.data['categoria']}",
         f"Saldo atual: {moeda_br(conta.data['saldo'])}",
-        f"Ultimas {len(trans_data)} transacoes: entradas {moeda_br(entradas)} | saidas {moeda_br(saidas)}",
+        f"Ultimas {len(trans_data)} transacoes: entradas {formatar_moeda(entradas)} | saidas {formatar_moeda(saidas)}",
         ''
     ]
 
@@ -296,12 +934,12 @@ def montar_relatorio_conta(user_id, conta_id):
             sinal = '+' if t['tipo'] == 'entrada' else '-'
             descricao = t.get('descricao') or 'Sem descricao'
             data = (t.get('data') or '')[:16]
-            linhas.append(f"- {data} | {descricao}: {sinal}{moeda_br(t['valor'])}")
+            linhas.append(f"- {data} | {descricao}: {sinal}{formatar_moeda(t['valor_centavos'])}")
 
     return '\n'.join(linhas)
 
 def montar_relatorio_lista(user_id, lista_id):
-    lista = supabase.table(TABLE_LISTAS)\
+    lista = get_supabase().table(TABLE_LISTAS)\
         .select('*').eq('id', lista_id)\
         .eq('user_id', user_id)\
         .single().execute()
@@ -309,11 +947,11 @@ def montar_relatorio_lista(user_id, lista_id):
     if not lista.data:
         raise ValueError('Lista nao encontrada.')
 
-    itens = supabase.table(TABLE_ITENS)\
+    itens = get_supabase().table(TABLE_ITENS)\
         .select('*').eq('lista_id', lista_id).execute()
 
-    itens_data = itens.data or []
-    total = sum(float(i['valor']) * int(i['quantidade']) for i in itens_data)
+    itens_data = com_centavos(itens.data or [], 'valor')
+    total = sum(i['valor_centavos'] * int(i['quantidade']) for i in itens_data)
 
     status = 'Concluida' if lista.data.get('concluida') else 'Pendente'
     linhas = [
@@ -322,7 +960,7 @@ def montar_relatorio_lista(user_id, lista_id):
         f"Lista: {lista.data['nome']}",
         f"Status: {status}",
         f"Qtd. itens: {len(itens_data)}",
-        f"Total: {moeda_br(total)}",
+        f"Total: {formatar_moeda(total)}",
         ''
     ]
 
@@ -331,13 +969,384 @@ def montar_relatorio_lista(user_id, lista_id):
     else:
         linhas.append('*Itens:*')
         for item in itens_data:
-            subtotal = float(item['valor']) * int(item['quantidade'])
+            subtotal = item['valor_centavos'] * int(item['quantidade'])
             linhas.append(
-                f"- {item['descricao']}: {item['quantidade']} x {moeda_br(item['valor'])} = {moeda_br(subtotal)}"
+                f"- {item['descricao']}: {item['quantidade']} x {formatar_moeda(item['valor_centavos'])} = {formatar_moeda(subtotal)}"
             )
 
     return '\n'.join(linhas)
 
+# ============================================================
+# TRANSAÇÕES RECORRENTES
+# ============================================================
+_FREQUENCIAS_MESES = {'mensal': 1, 'anual': 12}
+_RECORRENCIA_MAX_OCORRENCIAS = 120
+
+def _somar_meses(data, meses, dia):
+    """Avança `meses`, ajustando o dia ao fim do mês (31 -> 28/29/30)."""
+    total = data.month - 1 + meses
+    ano, mes = data.year + total // 12, total % 12 + 1
+    return date(ano, mes, min(dia, calendar.monthrange(ano, mes)[1]))
+
+def primeira_data_recorrencia(inicio, dia, frequencia):
+    data = _somar_meses(inicio, 0, dia)
+    if data < inicio:
+        data = _somar_meses(data, _FREQUENCIAS_MESES[frequencia], dia)
+    return data
+
+def ocorrencias_devidas(regra, ate):
+    """Datas da regra até `ate`; devolve (datas, próxima data, ainda ativa)."""
+    atual = date.fromisoformat(regra['proxima_data'][:10])
+    fim = date.fromisoformat(regra['data_fim'][:10]) if regra.get('data_fim') else None
+    meses = _FREQUENCIAS_MESES.get(regra.get('frequencia'), 1)
+    datas = []
+    while atual <= ate and (fim is None or atual <= fim) and len(datas) < _RECORRENCIA_MAX_OCORRENCIAS:
+        datas.append(atual)
+        atual = _somar_meses(atual, meses, int(regra['dia']))
+    return datas, atual, fim is None or atual <= fim
+
+def _lancar_lote_recorrencias(lancamentos, proximas, usuarios):
+    res = get_supabase().rpc('p01cf_lancar_recorrencias', {
+        'p_lancamentos': lancamentos,
+        'p_proximas': proximas
+    }).execute()
+    if usuarios:
+        get_supabase().table(TABLE_USUARIOS)\
+            .update({'versao_dados': time.time_ns()})\
+            .in_('id', sorted(usuarios)).execute()
+    return int(res.data or 0)
+
+@app.cli.command('materializar-recorrencias')
+@click.option('--ate', default=None, help='Lanca ocorrencias ate esta data (AAAA-MM-DD). Padrao: hoje.')
+@click.option('--lote', default=500, show_default=True, help='Ocorrencias por chamada ao banco.')
+def materializar_recorrencias(ate, lote):
+    """Lança as ocorrências vencidas de todas as regras recorrentes.
+
+    As regras são lidas em páginas por id e as ocorrências enviadas em
+    lotes para p01cf_lancar_recorrencias, que insere, ajusta o saldo uma
+    vez por conta dentro do lote e avança as regras na mesma transação.
+    Uma conta com regras em lotes diferentes recebe um ajuste por lote:
+    somar tudo para um único ajuste no fim deixaria o saldo errado se a
+    execução parasse no meio, já que a reexecução não relança o que já foi
+    inserido. Como cada (regra, competência) é única, reexecutar o comando
+    não duplica nada.
+    """
+    if get_supabase() is None:
+        raise click.ClickException('Configure SUPABASE_URL e SUPABASE_KEY no .env')
+    try:
+        limite = date.fromisoformat(ate) if ate else date.today()
+    except ValueError:
+        raise click.BadParameter('use o formato AAAA-MM-DD', param_hint='--ate')
+
+    lancamentos, proximas, usuarios = [], [], set()
+    inseridas = 0
+    ultimo_id = 0
+    try:
+        while True:
+            regras = get_supabase().table(TABLE_RECORRENCIAS)\
+                .select('*').eq('ativa', True)\
+                .lte('proxima_data', limite.isoformat())\
+                .gt('id', ultimo_id)\
+                .order('id').limit(1000).execute().data or []
+            if not regras:
+                break
+
+            for regra in regras:
+                datas, proxima, ativa = ocorrencias_devidas(regra, limite)
+                lancamentos.extend({
+                    'conta_id': regra['conta_id'],
+                    'tipo': regra['tipo'],
+                    'valor': reais(centavos(regra['valor'])),
+                    'descricao': regra['descricao'],
+                    'recorrencia_id': regra['id'],
+                    'competencia': d.isoformat()
+                } for d in datas)
+                proximas.append({'id': regra['id'], 'proxima_data': proxima.isoformat(), 'ativa': ativa})
+                usuarios.add(regra['user_id'])
+
+                # Uma regra nunca é dividida entre dois lotes.
+                if len(lancamentos) >= lote:
+                    inseridas += _lancar_lote_recorrencias(lancamentos, proximas, usuarios)
+                    lancamentos, proximas, usuarios = [], [], set()
+
+            ultimo_id = regras[-1]['id']
+
+        if proximas:
+            inseridas += _lancar_lote_recorrencias(lancamentos, proximas, usuarios)
+    except Exception as e:
+        # Lotes já gravados ficam; reexecutar continua sem duplicar.
+        raise click.ClickException(
+            f'Falha apos {inseridas} transacoes lancadas: {e}') from e
+    click.echo(f'{inseridas} transacoes recorrentes lancadas ate {limite.isoformat()}.')
+
+# ============================================================
+# CONCILIAÇÃO DE SALDOS
+# ============================================================
+# O saldo em p01cf_contas é mantido pelas rotas; este job confere se ele
+# continua batendo com o razão de transações sem reler o histórico inteiro.
+# Cada conta tem um checkpoint (última transação conferida e saldo esperado
+# até ela). Cada execução lê só as transações novas, em lotes por id a
+# partir de um cursor único (p01cf_conciliacao_cursor), e compara o saldo
+# apenas das contas que tiveram movimento. O cursor só avança depois que os
+# checkpoints do lote foram gravados.
+def _chunks(valores, tamanho):
+    valores = list(valores)
+    for inicio in range(0, len(valores), tamanho):
+        yield valores[inicio:inicio + tamanho]
+
+def _delta_transacao(t):
+    valor = centavos(t['valor'])
+    return valor if t['tipo'] == 'entrada' else -valor
+
+def _saldos_contas(ids):
+    saldos = {}
+    for parte in _chunks(ids, 500):
+        res = get_supabase().table(TABLE_CONTAS)\
+            .select('id,saldo').in_('id', parte).execute()
+        saldos.update({c['id']: centavos(c['saldo']) for c in res.data or []})
+    return saldos
+
+def _checkpoints(ids):
+    pontos = {}
+    for parte in _chunks(ids, 500):
+        res = get_supabase().table(TABLE_CONCILIACAO)\
+            .select('conta_id,ultima_transacao_id,saldo_verificado')\
+            .in_('conta_id', parte).execute()
+        pontos.update({
+            p['conta_id']: {
+                'conta_id': p['conta_id'],
+                'ultima_transacao_id': int(p['ultima_transacao_id']),
+                'saldo_verificado': centavos(p['saldo_verificado'])
+            } for p in res.data or []
+        })
+    return pontos
+
+def _cursor_conciliacao():
+    res = get_supabase().table(TABLE_CONCILIACAO_CURSOR)\
+        .select('ultima_transacao_id').eq('id', 1).execute()
+    return int(res.data[0]['ultima_transacao_id']) if res.data else 0
+
+def _avancar_cursor_conciliacao(transacao_id):
+    get_supabase().table(TABLE_CONCILIACAO_CURSOR).upsert({
+        'id': 1,
+        'ultima_transacao_id': transacao_id,
+        'atualizado_em': datetime.now().isoformat()
+    }).execute()
+
+def _tem_transacao_apos(conta_id, transacao_id):
+    res = get_supabase().table(TABLE_TRANSACOES)\
+        .select('id').eq('conta_id', conta_id)\
+        .gt('id', transacao_id).limit(1).execute()
+    return bool(res.data)
+
+def _conciliar(lote, max_lotes, espera, corrigir):
+    """Executa uma conciliação; devolve quantas divergências ficaram sem ajuste."""
+    novas = get_supabase().rpc('p01cf_conciliacao_iniciar', {}).execute().data or 0
+    if novas:
+        click.echo(f'{novas} contas receberam checkpoint inicial (base na posicao do cursor).')
+
+    ultimo_id = _cursor_conciliacao()
+
+    topo = get_supabase().table(TABLE_TRANSACOES)\
+        .select('id').order('id', desc=True).limit(1).execute().data
+    topo_id = int(topo[0]['id']) if topo else 0
+    # Ids menores que o topo podem ainda estar em commit; espera assentarem.
+    time.sleep(espera)
+
+    movimentadas = set()
+    lotes = 0
+    while ultimo_id < topo_id and lotes < max_lotes:
+        transacoes = get_supabase().table(TABLE_TRANSACOES)\
+            .select('id,conta_id,tipo,valor')\
+            .gt('id', ultimo_id).lte('id', topo_id)\
+            .order('id').limit(lote).execute().data or []
+        if not transacoes:
+            break
+
+        pontos = _checkpoints({t['conta_id'] for t in transacoes if t.get('conta_id')})
+        for t in transacoes:
+            ponto = pontos.get(t.get('conta_id'))
+            # Conta criada depois do início: recebe a base (no cursor) na próxima execução.
+            if ponto is None or t['id'] <= ponto['ultima_transacao_id']:
+                continue
+            ponto['saldo_verificado'] += _delta_transacao(t)
+            ponto['ultima_transacao_id'] = t['id']
+
+        if pontos:
+            agora = datetime.now().isoformat()
+            get_supabase().table(TABLE_CONCILIACAO).upsert([
+                dict(p, saldo_verificado=reais(p['saldo_verificado']), verificado_em=agora)
+                for p in pontos.values()
+            ]).execute()
+            movimentadas.update(pontos)
+
+        ultimo_id = transacoes[-1]['id']
+        # Reprocessar um lote é inofensivo (checkpoints ignoram ids já
+        # somados), então o cursor é gravado depois dos checkpoints.
+        _avancar_cursor_conciliacao(ultimo_id)
+        lotes += 1
+
+    if ultimo_id < topo_id:
+        click.echo(f'Execucao parcial: conferido ate a transacao {ultimo_id} de {topo_id}. '
+                   'Rode novamente para continuar.')
+
+    # Divergências já registradas voltam à comparação mesmo sem movimento,
+    # para que uma execução com --corrigir depois do relatório as ajuste.
+    registradas = get_supabase().table(TABLE_CONCILIACAO)\
+        .select('conta_id').neq('divergencia', 0).execute().data or []
+    movimentadas.update(p['conta_id'] for p in registradas)
+
+    # Compara o saldo atual com o esperado; divergências são confirmadas numa
+    # segunda leitura para não acusar transações gravadas durante o job.
+    pontos = _checkpoints(movimentadas)
+    saldos = _saldos_contas(movimentadas)
+    suspeitas = [
+        cid for cid, p in pontos.items()
+        if cid in saldos and saldos[cid] != p['saldo_verificado']
+        and not _tem_transacao_apos(cid, p['ultima_transacao_id'])
+    ]
+    divergentes = {}
+    if suspeitas:
+        time.sleep(espera)
+        releitura = _saldos_contas(suspeitas)
+        divergentes = {
+            cid: releitura[cid] - pontos[cid]['saldo_verificado']
+            for cid in suspeitas
+            if cid in releitura and releitura[cid] == saldos[cid]
+        }
+
+    if divergentes:
+        get_supabase().table(TABLE_CONCILIACAO).upsert([
+            dict(pontos[cid], saldo_verificado=reais(pontos[cid]['saldo_verificado']),
+                 divergencia=reais(diff), verificado_em=datetime.now().isoformat())
+            for cid, diff in divergentes.items()
+        ]).execute()
+    for cid, diff in sorted(divergentes.items()):
+        click.echo(f'Conta {cid}: saldo {formatar_moeda(saldos[cid])}, esperado '
+                   f'{formatar_moeda(pontos[cid]["saldo_verificado"])} (divergencia {formatar_moeda(diff)})',
+                   err=True)
+
+    if divergentes and corrigir:
+        get_supabase().rpc('p01cf_ajustar_saldos', {
+            'p_ajustes': [{'conta_id': cid, 'delta': reais(-diff)} for cid, diff in divergentes.items()]
+        }).execute()
+        get_supabase().table(TABLE_CONCILIACAO).upsert([
+            dict(pontos[cid], saldo_verificado=reais(pontos[cid]['saldo_verificado']),
+                 divergencia=0, verificado_em=datetime.now().isoformat())
+            for cid in divergentes
+        ]).execute()
+        click.echo(f'{len(divergentes)} saldos corrigidos.')
+
+    click.echo(f'{lotes} lotes lidos, {len(movimentadas)} contas conferidas, '
+               f'{len(divergentes)} com divergencia.')
+    return 0 if corrigir else len(divergentes)
+
+@app.cli.command('conciliar-saldos')
+@click.option('--lote', default=1000, show_default=True, help='Transacoes lidas por consulta.')
+@click.option('--max-lotes', default=100, show_default=True, help='Limite de lotes por execucao.')
+@click.option('--espera', default=2.0, show_default=True, help='Segundos para escritas em andamento terminarem.')
+@click.option('--corrigir', is_flag=True, help='Ajusta o saldo das contas com divergencia.')
+def conciliar_saldos(lote, max_lotes, espera, corrigir):
+    """Confere os saldos contra as transações novas desde o último checkpoint.
+
+    Sai com código 1 em falha de acesso ao banco ou quando restam
+    divergências não corrigidas (sem --corrigir).
+    """
+    if get_supabase() is None:
+        raise click.ClickException('Configure SUPABASE_URL e SUPABASE_KEY no .env')
+    try:
+        pendentes = _conciliar(lote, max_lotes, espera, corrigir)
+    except Exception as e:
+        raise click.ClickException(f'Falha na conciliacao: {e}') from e
+    if pendentes:
+        raise click.ClickException(
+            f'{pendentes} contas com divergencia; use --corrigir para ajustar.')
+
+# ============================================================
+# GRÁFICOS (séries temporais com redução LTTB)
+# ============================================================
+# O banco agrega as transações em um ponto por dia (p01cf_serie_saldo e
+# p01cf_serie_gastos); a série agregada fica no cache local por versão de
+# dados do usuário e cada pedido só a reduz ao número de pontos desejado,
+# então o JSON tem tamanho limitado qualquer que seja o histórico.
+_GRAFICO_PONTOS_PADRAO = 120
+_GRAFICO_PONTOS_MAX = 1000
+_GRAFICO_CACHE_TTL = 300
+_GRAFICO_PERIODOS = {'dia': 'day', 'semana': 'week', 'mes': 'month'}
+
+def reduzir_lttb(pontos, limite):
+    """Largest-Triangle-Three-Buckets: mantém o primeiro e o último ponto e,
+    em cada balde intermediário, o que forma o maior triângulo com o ponto
+    escolhido antes e a média do balde seguinte (preserva picos e vales)."""
+    n = len(pontos)
+    if limite >= n or limite < 3:
+        return list(pontos)
+
+    amostra = [pontos[0]]
+    tamanho = (n - 2) / (limite - 2)
+    anterior = 0
+    for i in range(limite - 2):
+        inicio = int(i * tamanho) + 1
+        fim = int((i + 1) * tamanho) + 1
+        seguinte = pontos[fim:min(int((i + 2) * tamanho) + 1, n)]
+        media_x = sum(p[0] for p in seguinte) / len(seguinte)
+        media_y = sum(p[1] for p in seguinte) / len(seguinte)
+
+        ax, ay = pontos[anterior]
+        escolhido, maior_area = inicio, -1
+        for j in range(inicio, fim):
+            x, y = pontos[j]
+            area = abs((ax - media_x) * (y - ay) - (ax - x) * (media_y - ay))
+            if area > maior_area:
+                escolhido, maior_area = j, area
+        amostra.append(pontos[escolhido])
+        anterior = escolhido
+    amostra.append(pontos[-1])
+    return amostra
+
+def _serie_em_cache(uid, chave, carregar):
+    versao = _versao_dados_usuario(uid)
+    if versao is None:
+        return carregar()
+    chave_cache = f'grafico:{uid}:{versao}:{chave}'
+    serie = cache_local.get(chave_cache)
+    if serie is None:
+        serie = carregar()
+        cache_local.set(chave_cache, serie, ttl=_GRAFICO_CACHE_TTL)
+    return serie
+
+def serie_saldo(uid, conta_id=None):
+    """[(ordinal do dia, saldo em centavos)] de uma conta ou de todas."""
+    def carregar():
+        res = get_supabase().rpc('p01cf_serie_saldo', {
+            'p_user_id': uid, 'p_conta_id': conta_id
+        }).execute()
+        return [
+            (date.fromisoformat(r['dia']).toordinal(), centavos(r['saldo']))
+            for r in res.data or []
+        ]
+    return _serie_em_cache(uid, f'saldo:{conta_id}', carregar)
+
+def serie_gastos(uid, periodo='day'):
+    """{categoria: [(ordinal do dia, total em centavos)]} das saídas."""
+    def carregar():
+        res = get_supabase().rpc('p01cf_serie_gastos', {
+            'p_user_id': uid, 'p_periodo': periodo
+        }).execute()
+        series = {}
+        for r in res.data or []:
+            series.setdefault(r['categoria'], []).append(
+                (date.fromisoformat(r['dia']).toordinal(), centavos(r['total']))
+            )
+        return series
+    return _serie_em_cache(uid, f'gastos:{periodo}', carregar)
+
+def _pontos_json(pontos, limite):
+    return [
+        {'data': date.fromordinal(x).isoformat(), 'valor': reais(y)}
+        for x, y in reduzir_lttb(pontos, limite)
+    ]
+
 # ============================================================
 # AUTENTICAÇÃO
 # ============================================================
@@ -353,19 +1362,338 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated
 
+# ------------------------------------------------------------
+# ETag por usuário: cada rota que altera dados grava um novo valor em
+# usuarios.versao_dados; as páginas derivam o ETag desse valor e respondem
+# 304 antes de consultar contas/listas e renderizar o template.
+# ------------------------------------------------------------
+_etag_salt_cache = None
+
+def _etag_salt():
+    """Muda quando o código ou os templates mudam (novo deploy)."""
+    global _etag_salt_cache
+    if _etag_salt_cache is None:
+        h = hashlib.sha1()
+        pasta = os.path.join(_BASE_DIR, 'templates')
+        for caminho in [os.path.abspath(__file__)] + sorted(
+            os.path.join(pasta, nome) for nome in os.listdir(pasta)
+        ):
+            h.update(f'{caminho}:{os.stat(caminho).st_mtime_ns}'.encode())
+        _etag_salt_cache = h.hexdigest()
+    return _etag_salt_cache
+
+def _versao_dados_usuario(uid):
+    try:
+        res = get_supabase().table(TABLE_USUARIOS)\
+            .select('versao_dados').eq('id', uid).single().execute()
+        return res.data.get('versao_dados')
+    except Exception:
+        return None
+
+def marcar_dados_alterados(uid):
+    try:
+        get_supabase().table(TABLE_USUARIOS)\
+            .update({'versao_dados': time.time_ns()}).eq('id', uid).execute()
+    except Exception:
+        pass
+
+def altera_dados(f):
+    """Avança a versão de dados do usuário quando a rota termina sem erro."""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        response = make_response(f(*args, **kwargs))
+        if response.status_code < 400 and session.get('user_id'):
+            marcar_dados_alterados(session['user_id'])
+        return response
+    return decorated
+
+def etag_por_usuario(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        uid = session.get('user_id')
+        # Mensagens flash pendentes precisam ser renderizadas, então não há 304.
+        if not uid or request.method != 'GET' or session.get('_flashes'):
+            return f(*args, **kwargs)
+
+        versao = _versao_dados_usuario(uid)
+        if versao is None:
+            return f(*args, **kwargs)
+
+        etag = hashlib.sha1(
+            f"{_etag_salt()}|{uid}|{session.get('user_nome')}|{versao}|{request.full_path}".encode()
+        ).hexdigest()
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+        else:
+            response = make_response(f(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag)
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
+    return decorated
+
 def get_usuario_logado():
     if 'user_id' not in session:
         return None
     try:
-        res = supabase.table(TABLE_USUARIOS).select('*').eq('id', session['user_id']).single().execute()
+        res = get_supabase().table(TABLE_USUARIOS).select('*').eq('id', session['user_id']).single().execute()
         return res.data
     except:
         return None
 
 
+# ============================================================
+# IMAGENS RESPONSIVAS (/img?w=320&fmt=webp)
+# ============================================================
+# Variantes redimensionadas são geradas com Pillow no primeiro pedido e
+# guardadas em build/img-cache. O cache tem tamanho máximo (IMG_CACHE_MAX_MB);
+# ao passar do limite, as variantes acessadas há mais tempo são removidas.
+_IMG_DIR = os.path.join(_BASE_DIR, 'img')
+_IMG_CACHE_DIR = os.path.join(_BASE_DIR, 'build', 'img-cache')
+_IMG_CACHE_MAX_BYTES = int(os.getenv('IMG_CACHE_MAX_MB', '64')) * 1024 * 1024
+_IMG_LARGURAS = (64, 96, 128, 192, 320, 480, 640, 960, 1280)
+_IMG_FORMATOS = {'webp': 'WEBP', 'jpeg': 'JPEG', 'jpg': 'JPEG', 'png': 'PNG'}
+_IMG_MAX_AGE = 7 * 24 * 3600
+_IMG_PODA_CARENCIA = 60
+
+def _podar_cache_imagens():
+    # Arquivos .tmp e variantes recém-gravadas podem estar em uso por outro
+    # worker (escrita ou envio em andamento); só entram na soma.
+    arquivos = []
+    total = 0
+    recentes = time.time() - _IMG_PODA_CARENCIA
+    for entry in os.scandir(_IMG_CACHE_DIR):
+        if entry.is_file():
+            st = entry.stat()
+            total += st.st_size
+            if not entry.name.endswith('.tmp') and st.st_mtime < recentes:
+                arquivos.append((st.st_atime, st.st_size, entry.path))
+    if total <= _IMG_CACHE_MAX_BYTES:
+        return
+    for _, tamanho, caminho in sorted(arquivos):
+        try:
+            os.remove(caminho)
+        except OSError:
+            continue
+        total -= tamanho
+        if total <= _IMG_CACHE_MAX_BYTES:
+            break
+
+def _gerar_variante_imagem(origem, largura, fmt):
+    from PIL import Image, ImageOps
+
+    st = os.stat(origem)
+    chave = hashlib.sha1(
+        f'{origem}|{st.st_mtime_ns}|{st.st_size}|{largura}|{fmt}'.encode()
+    ).hexdigest()
+    destino = os.path.join(_IMG_CACHE_DIR, f'{chave}.{fmt}')
+    if os.path.isfile(destino):
+        os.utime(destino)
+        return destino
+
+    with Image.open(origem) as img:
+        img = ImageOps.exif_transpose(img)
+        if largura and largura < img.width:
+            altura = max(1, round(img.height * largura / img.width))
+            img = img.resize((largura, altura), Image.LANCZOS)
+        if _IMG_FORMATOS[fmt] == 'JPEG' and img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+
+        os.makedirs(_IMG_CACHE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=_IMG_CACHE_DIR, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                img.save(tmp, format=_IMG_FORMATOS[fmt], quality=82, optimize=True)
+            os.replace(tmp_path, destino)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+    _podar_cache_imagens()
+    return destino
+
 @app.route('/img/<path:filename>')
 def img_file(filename):
-    return send_from_directory(os.path.join(_BASE_DIR, 'img'), filename)
+    largura = request.args.get('w', type=int)
+    fmt = (request.args.get('fmt') or '').lower()
+    if largura is None and not fmt:
+        return send_from_directory(_IMG_DIR, filename)
+
+    if largura is not None and largura not in _IMG_LARGURAS:
+        abort(400)
+    if fmt and fmt not in _IMG_FORMATOS:
+        abort(400)
+
+    origem = safe_join(_IMG_DIR, filename)
+    if origem is None or not os.path.isfile(origem):
+        abort(404)
+    if not fmt:
+        fmt = os.path.splitext(filename)[1].lower().lstrip('.')
+        if fmt not in _IMG_FORMATOS:
+            abort(400)
+
+    from PIL import Image, UnidentifiedImageError
+    Image.init()
+    if _IMG_FORMATOS[fmt] not in Image.SAVE:
+        abort(415)  # Pillow sem o codificador (ex.: compilado sem WebP)
+    try:
+        variante = _gerar_variante_imagem(origem, largura, fmt)
+    except UnidentifiedImageError:
+        abort(415)
+    return send_file(variante, mimetype=f'image/{_IMG_FORMATOS[fmt].lower()}', max_age=_IMG_MAX_AGE)
+
+@app.template_global()
+def img_srcset(filename, larguras=(320, 640, 960), fmt='webp'):
+    """Valor para o atributo srcset com as variantes de /img."""
+    return ', '.join(
+        f"{url_for('img_file', filename=filename, w=w, fmt=fmt)} {w}w" for w in larguras
+    )
+
+
+# ============================================================
+# ASSETS ESTÁTICOS (fingerprint + pré-compressão)
+# ============================================================
+# `flask --app app build-assets` copia static/ e img/ para build/assets com o
+# hash do conteúdo no nome e gera variantes .gz/.br. O manifesto mapeia o
+# caminho lógico para o nome versionado; como a URL muda quando o arquivo
+# muda, os assets podem ser servidos com cache imutável de 1 ano.
+_ASSETS_DIR = os.path.join(_BASE_DIR, 'build', 'assets')
+_ASSETS_MANIFEST = os.path.join(_ASSETS_DIR, 'manifest.json')
+_ASSETS_ORIGENS = {'static': os.path.join(_BASE_DIR, 'static'), 'img': os.path.join(_BASE_DIR, 'img')}
+_ASSETS_COMPRIMIVEIS = ('.css', '.js', '.json', '.svg', '.html', '.txt', '.webmanifest')
+_ASSETS_MAX_AGE = 365 * 24 * 3600
+_assets_manifest = None
+
+def _carregar_manifest_assets():
+    global _assets_manifest
+    if _assets_manifest is None:
+        try:
+            with open(_ASSETS_MANIFEST, encoding='utf-8') as f:
+                _assets_manifest = json.load(f)
+        except (OSError, ValueError):
+            _assets_manifest = {}
+    return _assets_manifest
+
+@app.template_global()
+def asset_url(filename, origem='static'):
+    """URL versionada do asset; sem build, cai nas rotas originais."""
+    versionado = _carregar_manifest_assets().get(f'{origem}/{filename}')
+    if versionado:
+        return url_for('asset_file', filename=versionado)
+    if origem == 'img':
+        return url_for('img_file', filename=filename)
+    return url_for('static', filename=filename)
+
+@app.route('/assets/<path:filename>')
+def asset_file(filename):
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    encodings = request.accept_encodings
+    escolhido, encoding = filename, None
+    for enc, ext in (('br', '.br'), ('gzip', '.gz')):
+        if encodings.quality(enc) > 0 and os.path.isfile(os.path.join(_ASSETS_DIR, filename + ext)):
+            escolhido, encoding = filename + ext, enc
+            break
+
+    response = send_from_directory(_ASSETS_DIR, escolhido, mimetype=mimetype, max_age=_ASSETS_MAX_AGE)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+@app.cli.command('build-assets')
+def build_assets():
+    """Gera build/assets com nomes versionados e variantes gzip/brotli."""
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+        print('Aviso: pacote brotli ausente, gerando apenas variantes gzip.')
+
+    shutil.rmtree(_ASSETS_DIR, ignore_errors=True)
+    manifest = {}
+    for origem, pasta in _ASSETS_ORIGENS.items():
+        for raiz, _, arquivos in os.walk(pasta):
+            for nome in arquivos:
+                caminho = os.path.join(raiz, nome)
+                relativo = os.path.relpath(caminho, pasta).replace(os.sep, '/')
+                with open(caminho, 'rb') as f:
+                    conteudo = f.read()
+
+                base, ext = os.path.splitext(relativo)
+                digest = hashlib.sha256(conteudo).hexdigest()[:12]
+                versionado = f'{origem}/{base}.{digest}{ext}'
+                destino = os.path.join(_ASSETS_DIR, versionado)
+                os.makedirs(os.path.dirname(destino), exist_ok=True)
+                with open(destino, 'wb') as f:
+                    f.write(conteudo)
+
+                if ext.lower() in _ASSETS_COMPRIMIVEIS:
+                    with open(destino + '.gz', 'wb') as f:
+                        f.write(gzip.compress(conteudo, compresslevel=9, mtime=0))
+                    if brotli is not None:
+                        with open(destino + '.br', 'wb') as f:
+                            f.write(brotli.compress(conteudo, quality=11))
+
+                manifest[f'{origem}/{relativo}'] = versionado
+
+    with open(_ASSETS_MANIFEST, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    print(f'{len(manifest)} assets gerados em {_ASSETS_DIR}')
+
+
+# ============================================================
+# PWA (service worker e manifesto)
+# ============================================================
+# O service worker (templates/sw.js) guarda o shell do app: CSS/JS do CDN,
+# assets e as páginas já visitadas, para abrir a lista de compras sem
+# conexão. Os dados da lista e a fila de alterações ficam no IndexedDB
+# (static/js/script.js) e sobem por /lista/<id>/itens/sincronizar.
+_PWA_ICONE = 'Logos de Membros.png'
+_PWA_CDN = (
+    'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css',
+    'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.0/font/bootstrap-icons.css',
+    'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js',
+)
+
+def _arquivos_shell():
+    return [
+        asset_url('js/script.js'),
+        asset_url('js/graficos.js'),
+        asset_url(_PWA_ICONE, origem='img'),
+        *_PWA_CDN
+    ]
+
+@app.route('/sw.js')
+def service_worker():
+    arquivos = _arquivos_shell()
+    # Nome do cache muda junto com as URLs versionadas dos assets.
+    versao = hashlib.sha1('|'.join(arquivos).encode()).hexdigest()[:12]
+    response = make_response(render_template(
+        'sw.js', arquivos=arquivos, versao=versao, pagina_inicial=url_for('listas_compras')
+    ))
+    response.mimetype = 'application/javascript'
+    response.cache_control.no_cache = True
+    return response
+
+@app.route('/manifest.webmanifest')
+def manifesto_pwa():
+    response = jsonify({
+        'name': 'Zuna - Controle Financeiro',
+        'short_name': 'Zuna',
+        'start_url': url_for('listas_compras'),
+        'display': 'standalone',
+        'background_color': '#f4f6f9',
+        'theme_color': '#210d3e',
+        'icons': [
+            {'src': url_for('img_file', filename=_PWA_ICONE, w=192, fmt='png'), 'sizes': '192x192', 'type': 'image/png'},
+            {'src': asset_url(_PWA_ICONE, origem='img'), 'sizes': '500x500', 'type': 'image/png'}
+        ]
+    })
+    response.mimetype = 'application/manifest+json'
+    return response
 
 # ============================================================
 # ROTAS DE AUTENTICAÇÃO
@@ -373,7 +1701,7 @@ def img_file(filename):
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
-    if supabase is None:
+    if get_supabase() is None:
         return render_template('sem_config.html')
     if 'user_id' in session:
         return redirect(url_for('index'))
@@ -383,7 +1711,7 @@ def login():
         senha = hash_senha(request.form['senha'])
 
         try:
-            res = supabase.table(TABLE_USUARIOS)\
+            res = get_supabase().table(TABLE_USUARIOS)\
                 .select('*')\
                 .eq('email', email)\
                 .eq('senha', senha)\
@@ -404,7 +1732,7 @@ def login():
 
 @app.route('/cadastro', methods=['GET', 'POST'])
 def cadastro():
-    if supabase is None:
+    if get_supabase() is None:
         return render_template('sem_config.html')
     if 'user_id' in session:
         return redirect(url_for('index'))
@@ -430,7 +1758,7 @@ def cadastro():
 
         # Verificar se email já existe
         try:
-            existe = supabase.table(TABLE_USUARIOS)\
+            existe = get_supabase().table(TABLE_USUARIOS)\
                 .select('id')\
                 .eq('email', email)\
                 .execute()
@@ -440,7 +1768,7 @@ def cadastro():
                 return render_template('cadastro.html')
 
             # Criar usuário
-            novo = supabase.table(TABLE_USUARIOS).insert({
+            novo = get_supabase().table(TABLE_USUARIOS).insert({
                 'nome': nome,
                 'email': email,
                 'senha': hash_senha(senha),
@@ -481,7 +1809,7 @@ def perfil():
 
             # Verificar se o email já pertence a outro usuário
             try:
-                existe = supabase.table(TABLE_USUARIOS)\
+                existe = get_supabase().table(TABLE_USUARIOS)\
                     .select('id')\
                     .eq('email', email)\
                     .neq('id', session['user_id'])\
@@ -491,7 +1819,7 @@ def perfil():
                     flash('Este email já está em uso.', 'danger')
                     return render_template('perfil.html', usuario=usuario)
 
-                supabase.table(TABLE_USUARIOS).update({
+                get_supabase().table(TABLE_USUARIOS).update({
                     'nome': nome,
                     'email': email
                 }).eq('id', session['user_id']).execute()
@@ -520,7 +1848,7 @@ def perfil():
                 flash('A nova senha deve ter pelo menos 6 caracteres.', 'danger')
                 return render_template('perfil.html', usuario=usuario)
 
-            supabase.table(TABLE_USUARIOS).update({
+            get_supabase().table(TABLE_USUARIOS).update({
                 'senha': hash_senha(nova_senha)
             }).eq('id', session['user_id']).execute()
 
@@ -535,35 +1863,111 @@ def perfil():
 # ============================================================
 
 @app.route('/')
+@etag_por_usuario
 def index():
     if not session.get('user_id'):
         return render_template('landing.html')
 
     try:
-        contas = supabase.table(TABLE_CONTAS)\
+        contas = get_supabase().table(TABLE_CONTAS)\
             .select('*')\
             .eq('user_id', session['user_id'])\
             .order('categoria').order('nome').execute()
 
         categorias  = {}
         total_geral = 0
+        arquivadas  = com_centavos([c for c in contas.data if c.get('arquivada')], 'saldo')
 
-        for conta in contas.data:
+        for conta in com_centavos([c for c in contas.data if not c.get('arquivada')], 'saldo'):
             cat = conta['categoria']
             if cat not in categorias:
                 categorias[cat] = {'contas': [], 'total': 0}
             categorias[cat]['contas'].append(conta)
-            categorias[cat]['total']  += float(conta['saldo'])
-            total_geral               += float(conta['saldo'])
+            categorias[cat]['total']  += conta['saldo_centavos']
+            total_geral               += conta['saldo_centavos']
 
-        return render_template('index.html', categorias=categorias, total_geral=total_geral)
+        return render_template('index.html', categorias=categorias, total_geral=total_geral,
+                               contas_arquivadas=arquivadas)
     except Exception as e:
         flash(f'Erro ao carregar dados: {str(e)}', 'danger')
-        return render_template('index.html', categorias={}, total_geral=0)
+        return render_template('index.html', categorias={}, total_geral=0, contas_arquivadas=[])
+
+
+_BUSCA_POR_PAGINA = 20
+
+@app.route('/buscar')
+@login_required
+def buscar():
+    termo = (request.args.get('q') or '').strip()[:100]
+    pagina = max(request.args.get('pagina', 1, type=int), 1)
+
+    if len(termo) < 3:
+        return jsonify({'erro': 'Informe ao menos 3 caracteres para buscar.'}), 400
+
+    try:
+        # Busca com ranking por trigramas no banco (ver p01cf_buscar no setup.sql).
+        # Pede um registro a mais para saber se existe próxima página.
+        res = get_supabase().rpc('p01cf_buscar', {
+            'p_user_id': session['user_id'],
+            'p_termo':   termo,
+            'p_limite':  _BUSCA_POR_PAGINA + 1,
+            'p_offset':  (pagina - 1) * _BUSCA_POR_PAGINA
+        }).execute()
+    except Exception as e:
+        return jsonify({'erro': f'Falha na busca: {str(e)}'}), 500
+
+    resultados = res.data or []
+    return jsonify({
+        'q': termo,
+        'pagina': pagina,
+        'tem_mais': len(resultados) > _BUSCA_POR_PAGINA,
+        'resultados': resultados[:_BUSCA_POR_PAGINA]
+    })
+
+
+def _limite_pontos_grafico():
+    limite = request.args.get('pontos', _GRAFICO_PONTOS_PADRAO, type=int)
+    return min(max(limite, 3), _GRAFICO_PONTOS_MAX)
+
+
+@app.route('/graficos/saldo')
+@login_required
+@etag_por_usuario
+def grafico_saldo():
+    conta_id = request.args.get('conta', type=int)
+    limite = _limite_pontos_grafico()
+    try:
+        serie = serie_saldo(session['user_id'], conta_id)
+    except Exception as e:
+        return jsonify({'erro': f'Falha ao montar grafico: {str(e)}'}), 500
+    return jsonify({
+        'conta': conta_id,
+        'total_pontos': len(serie),
+        'pontos': _pontos_json(serie, limite)
+    })
+
+
+@app.route('/graficos/gastos')
+@login_required
+@etag_por_usuario
+def grafico_gastos():
+    periodo = _GRAFICO_PERIODOS.get(request.args.get('periodo', 'dia'))
+    if not periodo:
+        return jsonify({'erro': 'Periodo deve ser dia, semana ou mes.'}), 400
+    limite = _limite_pontos_grafico()
+    try:
+        series = serie_gastos(session['user_id'], periodo)
+    except Exception as e:
+        return jsonify({'erro': f'Falha ao montar grafico: {str(e)}'}), 500
+    return jsonify({
+        'periodo': request.args.get('periodo', 'dia'),
+        'series': {cat: _pontos_json(pontos, limite) for cat, pontos in series.items()}
+    })
 
 
 @app.route('/whatsapp/enviar-relatorio', methods=['POST'])
 @login_required
+@limitar_taxa('whatsapp')
 def enviar_relatorio_whatsapp():
     uid = session['user_id']
     numero = normalizar_numero_whatsapp(request.form.get('numero'))
@@ -597,15 +2001,36 @@ def enviar_relatorio_whatsapp():
     return redirect(redirect_to)
 
 
+@app.route('/metricas/limites')
+def metricas_limites():
+    # Endpoint operacional: só existe com METRICAS_TOKEN configurado e exige
+    # o cabeçalho "Authorization: Bearer <token>".
+    token = os.getenv('METRICAS_TOKEN')
+    if not token:
+        abort(404)
+    enviado = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    if not secrets.compare_digest(enviado.encode(), token.encode()):
+        abort(401)
+    with _metricas_lock:
+        contadores = {p: dict(v) for p, v in _metricas_limites.items()}
+    return jsonify({
+        'pid': os.getpid(),
+        'armazenamento': _limitador.nome,
+        'limites': _LIMITES,
+        'contadores': contadores
+    })
+
+
 @app.route('/conta/adicionar', methods=['POST'])
 @login_required
+@altera_dados
 def adicionar_conta():
-    supabase.table(TABLE_CONTAS).insert({
+    get_supabase().table(TABLE_CONTAS).insert({
         'user_id':   session['user_id'],
         'nome':      request.form['nome'],
         'banco':     request.form['banco'],
         'categoria': request.form['categoria'],
-        'saldo':     float(request.form.get('saldo', 0)),
+        'saldo':     reais(centavos(request.form.get('saldo', 0))),
         'cor':       request.form.get('cor', '#007bff')
     }).execute()
     flash('Conta criada com sucesso!', 'success')
@@ -614,8 +2039,9 @@ def adicionar_conta():
 
 @app.route('/conta/<int:id>')
 @login_required
+@etag_por_usuario
 def ver_conta(id):
-    conta = supabase.table(TABLE_CONTAS)\
+    conta = get_supabase().table(TABLE_CONTAS)\
         .select('*').eq('id', id)\
         .eq('user_id', session['user_id'])\
         .single().execute()
@@ -624,29 +2050,101 @@ def ver_conta(id):
         flash('Conta não encontrada.', 'danger')
         return redirect(url_for('index'))
 
-    transacoes = supabase.table(TABLE_TRANSACOES)\
+    transacoes = get_supabase().table(TABLE_TRANSACOES)\
         .select('*').eq('conta_id', id)\
         .order('data', desc=True).limit(50).execute()
 
-    return render_template('conta.html', conta=conta.data, transacoes=transacoes.data)
+    try:
+        recorrencias = get_supabase().table(TABLE_RECORRENCIAS)\
+            .select('*').eq('conta_id', id)\
+            .eq('user_id', session['user_id'])\
+            .order('proxima_data').execute().data
+    except Exception:
+        recorrencias = []
+
+    com_centavos([conta.data], 'saldo')
+    return render_template('conta.html', conta=conta.data,
+                           transacoes=com_centavos(transacoes.data or [], 'valor'),
+                           recorrencias=com_centavos(recorrencias or [], 'valor'))
+
+
+@app.route('/conta/<int:id>/recorrencia', methods=['POST'])
+@login_required
+@altera_dados
+def adicionar_recorrencia(id):
+    uid = session['user_id']
+    conta = get_supabase().table(TABLE_CONTAS)\
+        .select('id').eq('id', id)\
+        .eq('user_id', uid).execute()
+    if not conta.data:
+        flash('Conta não encontrada.', 'danger')
+        return redirect(url_for('index'))
+
+    tipo = request.form.get('tipo')
+    frequencia = request.form.get('frequencia', 'mensal')
+    descricao = (request.form.get('descricao') or '').strip()
+    try:
+        valor = centavos(request.form['valor'])
+        dia = int(request.form['dia'])
+        inicio = date.fromisoformat(request.form.get('inicio') or date.today().isoformat())
+        data_fim = request.form.get('data_fim') or None
+        if data_fim:
+            data_fim = date.fromisoformat(data_fim).isoformat()
+    except (KeyError, ValueError):
+        flash('Dados da recorrencia invalidos.', 'danger')
+        return redirect(url_for('ver_conta', id=id))
+
+    if tipo not in ('entrada', 'saida') or frequencia not in _FREQUENCIAS_MESES:
+        flash('Tipo ou frequencia invalidos.', 'danger')
+        return redirect(url_for('ver_conta', id=id))
+    if not descricao or valor <= 0 or not 1 <= dia <= 31:
+        flash('Informe descricao, valor positivo e dia entre 1 e 31.', 'danger')
+        return redirect(url_for('ver_conta', id=id))
+
+    get_supabase().table(TABLE_RECORRENCIAS).insert({
+        'user_id':      uid,
+        'conta_id':     id,
+        'tipo':         tipo,
+        'valor':        reais(valor),
+        'descricao':    descricao,
+        'frequencia':   frequencia,
+        'dia':          dia,
+        'proxima_data': primeira_data_recorrencia(inicio, dia, frequencia).isoformat(),
+        'data_fim':     data_fim
+    }).execute()
+    flash('Recorrencia criada!', 'success')
+    return redirect(url_for('ver_conta', id=id))
+
+
+@app.route('/conta/<int:id>/recorrencia/<int:recorrencia_id>/deletar', methods=['POST'])
+@login_required
+@altera_dados
+def deletar_recorrencia(id, recorrencia_id):
+    get_supabase().table(TABLE_RECORRENCIAS)\
+        .delete().eq('id', recorrencia_id)\
+        .eq('conta_id', id)\
+        .eq('user_id', session['user_id']).execute()
+    flash('Recorrencia removida!', 'success')
+    return redirect(url_for('ver_conta', id=id))
 
 
 @app.route('/conta/<int:id>/transacao', methods=['POST'])
 @login_required
+@altera_dados
 def adicionar_transacao(id):
     tipo  = request.form['tipo']
-    valor = float(request.form['valor'])
+    valor = centavos(request.form['valor'])
 
-    supabase.table(TABLE_TRANSACOES).insert({
+    get_supabase().table(TABLE_TRANSACOES).insert({
         'conta_id':  id,
         'tipo':      tipo,
-        'valor':     valor,
-        'descricao': request.form['descricao']
+        'valor':     reais(valor),
+        'descricao': request.form['descricao'].strip()
     }).execute()
 
-    conta = supabase.table(TABLE_CONTAS).select('saldo').eq('id', id).single().execute()
-    novo  = float(conta.data['saldo']) + (valor if tipo == 'entrada' else -valor)
-    supabase.table(TABLE_CONTAS).update({'saldo': novo}).eq('id', id).execute()
+    conta = get_supabase().table(TABLE_CONTAS).select('saldo').eq('id', id).single().execute()
+    novo  = centavos(conta.data['saldo']) + (valor if tipo == 'entrada' else -valor)
+    get_supabase().table(TABLE_CONTAS).update({'saldo': reais(novo)}).eq('id', id).execute()
 
     flash('Transação registrada!', 'success')
     return redirect(url_for('ver_conta', id=id))
@@ -654,8 +2152,9 @@ def adicionar_transacao(id):
 
 @app.route('/conta/<int:id>/editar', methods=['POST'])
 @login_required
+@altera_dados
 def editar_conta(id):
-    supabase.table(TABLE_CONTAS).update({
+    get_supabase().table(TABLE_CONTAS).update({
         'nome':      request.form['nome'],
         'banco':     request.form['banco'],
         'categoria': request.form['categoria'],
@@ -667,78 +2166,127 @@ def editar_conta(id):
 
 @app.route('/conta/<int:id>/deletar', methods=['POST'])
 @login_required
+@altera_dados
 def deletar_conta(id):
     try:
-        uid = session['user_id']
-
-        conta = supabase.table(TABLE_CONTAS)\
-            .select('id')\
-            .eq('id', id)\
-            .eq('user_id', uid)\
-            .single().execute()
-
-        if not conta.data:
+        if aplicar_em_lote(TABLE_CONTAS, 'p01cf_excluir_contas', session['user_id'], [id], 'deletar'):
+            flash('Conta deletada!', 'success')
+        else:
             flash('Conta não encontrada.', 'danger')
-            return redirect(url_for('index'))
+    except Exception as e:
+        flash(f'Não foi possível deletar a conta: {str(e)}', 'danger')
+    return redirect(url_for('index'))
 
-        # Remove referência da conta em listas já concluídas/associadas.
-        supabase.table(TABLE_LISTAS)\
-            .update({'conta_id': None})\
-            .eq('user_id', uid)\
-            .eq('conta_id', id).execute()
 
-        # Remove histórico de transações da conta antes de excluir a conta.
-        supabase.table(TABLE_TRANSACOES)\
-            .delete().eq('conta_id', id).execute()
+# ============================================================
+# OPERAÇÕES EM LOTE (contas e listas)
+# ============================================================
+# Arquivar/restaurar é um único update; excluir é uma única RPC que deixa as
+# transações e itens para o ON DELETE CASCADE (ver p01cf_excluir_contas e
+# p01cf_excluir_listas no setup.sql). Uma ida ao banco por lote, qualquer
+# que seja o número de linhas dependentes.
+_ACOES_LOTE = {'arquivar': 'arquivada(s)', 'desarquivar': 'restaurada(s)', 'deletar': 'excluida(s)'}
+
+def _ids_do_formulario():
+    ids = []
+    for valor in request.form.getlist('ids'):
+        try:
+            ids.append(int(valor))
+        except ValueError:
+            continue
+    return list(dict.fromkeys(ids))
+
+def aplicar_em_lote(tabela, funcao_exclusao, uid, ids, acao):
+    """Aplica a ação às linhas do usuário; devolve quantas foram afetadas."""
+    if acao == 'deletar':
+        res = get_supabase().rpc(funcao_exclusao, {'p_user_id': uid, 'p_ids': ids}).execute()
+        return res.data or 0
+    res = get_supabase().table(tabela)\
+        .update({'arquivada': acao == 'arquivar'})\
+        .eq('user_id', uid)\
+        .in_('id', ids).execute()
+    return len(res.data or [])
+
+def _lote_do_formulario(tabela, funcao_exclusao, nome):
+    acao = request.form.get('acao')
+    ids = _ids_do_formulario()
+    if acao not in _ACOES_LOTE or not ids:
+        flash(f'Selecione ao menos uma {nome} e a acao desejada.', 'warning')
+        return
+    # Nada é aplicado: cortar a seleção mostraria sucesso agindo só em parte.
+    if len(ids) > _MAX_ITENS_LOTE:
+        flash(f'Selecione no maximo {_MAX_ITENS_LOTE} itens por vez; nenhuma {nome} foi alterada.', 'danger')
+        return
+    try:
+        total = aplicar_em_lote(tabela, funcao_exclusao, session['user_id'], ids, acao)
+        flash(f'{total} {nome}(s) {_ACOES_LOTE[acao]}.', 'success')
+    except Exception as e:
+        flash(f'Nao foi possivel concluir a operacao: {str(e)}', 'danger')
 
-        supabase.table(TABLE_CONTAS)\
-            .delete().eq('id', id)\
-            .eq('user_id', uid).execute()
 
-        flash('Conta deletada!', 'success')
-    except Exception as e:
-        flash(f'Não foi possível deletar a conta: {str(e)}', 'danger')
+@app.route('/contas/lote', methods=['POST'])
+@login_required
+@altera_dados
+def contas_em_lote():
+    _lote_do_formulario(TABLE_CONTAS, 'p01cf_excluir_contas', 'conta')
     return redirect(url_for('index'))
 
 
+@app.route('/listas/lote', methods=['POST'])
+@login_required
+@altera_dados
+def listas_em_lote():
+    _lote_do_formulario(TABLE_LISTAS, 'p01cf_excluir_listas', 'lista')
+    return redirect(url_for('listas_compras'))
+
+
 # ============================================================
 # LISTAS DE COMPRAS
 # ============================================================
 
 @app.route('/listas')
 @login_required
+@etag_por_usuario
 def listas_compras():
     try:
         uid = session['user_id']
 
-        listas_ativas = supabase.table(TABLE_LISTAS)\
+        listas_ativas = get_supabase().table(TABLE_LISTAS)\
             .select('*').eq('user_id', uid)\
             .eq('concluida', False)\
+            .eq('arquivada', False)\
             .order('data_criacao', desc=True).execute()
 
         for lista in listas_ativas.data:
-            itens = supabase.table(TABLE_ITENS).select('*').eq('lista_id', lista['id']).execute()
-            lista['itens_lista'] = itens.data
-            lista['total'] = sum(float(i['valor']) * i['quantidade'] for i in itens.data)
+            itens = get_supabase().table(TABLE_ITENS).select('*').eq('lista_id', lista['id']).execute()
+            lista['itens_lista'] = com_centavos(itens.data, 'valor')
+            lista['total'] = sum(i['valor_centavos'] * i['quantidade'] for i in itens.data)
 
-        listas_concluidas = supabase.table(TABLE_LISTAS)\
+        listas_concluidas = get_supabase().table(TABLE_LISTAS)\
             .select('*').eq('user_id', uid)\
             .eq('concluida', True)\
+            .eq('arquivada', False)\
             .order('data_conclusao', desc=True).limit(10).execute()
 
         for lista in listas_concluidas.data:
-            itens = supabase.table(TABLE_ITENS).select('*').eq('lista_id', lista['id']).execute()
-            lista['itens_lista'] = itens.data
-            lista['total'] = sum(float(i['valor']) * i['quantidade'] for i in itens.data)
+            itens = get_supabase().table(TABLE_ITENS).select('*').eq('lista_id', lista['id']).execute()
+            lista['itens_lista'] = com_centavos(itens.data, 'valor')
+            lista['total'] = sum(i['valor_centavos'] * i['quantidade'] for i in itens.data)
             if lista.get('conta_id'):
-                c = supabase.table(TABLE_CONTAS).select('nome').eq('id', lista['conta_id']).single().execute()
+                c = get_supabase().table(TABLE_CONTAS).select('nome').eq('id', lista['conta_id']).single().execute()
                 lista['contas'] = c.data or {}
             else:
                 lista['contas'] = {}
 
+        listas_arquivadas = get_supabase().table(TABLE_LISTAS)\
+            .select('id, nome, data_criacao, concluida').eq('user_id', uid)\
+            .eq('arquivada', True)\
+            .order('data_criacao', desc=True).limit(_MAX_ITENS_LOTE).execute()
+
         return render_template('listas_compras.html',
                                listas_ativas=listas_ativas.data,
-                               listas_concluidas=listas_concluidas.data)
+                               listas_concluidas=listas_concluidas.data,
+                               listas_arquivadas=listas_arquivadas.data)
     except Exception as e:
         flash(f'Erro: {str(e)}', 'danger')
         return redirect(url_for('index'))
@@ -746,8 +2294,9 @@ def listas_compras():
 
 @app.route('/lista/nova', methods=['POST'])
 @login_required
+@altera_dados
 def nova_lista():
-    lista = supabase.table(TABLE_LISTAS).insert({
+    lista = get_supabase().table(TABLE_LISTAS).insert({
         'user_id': session['user_id'],
         'nome': request.form['nome']
     }).execute()
@@ -757,8 +2306,9 @@ def nova_lista():
 
 @app.route('/lista/<int:id>')
 @login_required
+@etag_por_usuario
 def ver_lista(id):
-    lista = supabase.table(TABLE_LISTAS)\
+    lista = get_supabase().table(TABLE_LISTAS)\
         .select('*').eq('id', id)\
         .eq('user_id', session['user_id'])\
         .single().execute()
@@ -767,20 +2317,24 @@ def ver_lista(id):
         flash('Lista não encontrada.', 'danger')
         return redirect(url_for('listas_compras'))
 
-    itens  = supabase.table(TABLE_ITENS).select('*').eq('lista_id', id).execute()
-    total  = sum(float(i['valor']) * i['quantidade'] for i in itens.data)
-    contas = supabase.table(TABLE_CONTAS)\
-        .select('*').eq('user_id', session['user_id']).execute()
+    itens  = get_supabase().table(TABLE_ITENS).select('*').eq('lista_id', id).order('id').execute()
+    total  = sum(i['valor_centavos'] * i['quantidade'] for i in com_centavos(itens.data, 'valor'))
+    contas = get_supabase().table(TABLE_CONTAS)\
+        .select('*').eq('user_id', session['user_id'])\
+        .eq('arquivada', False).execute()
 
     return render_template('lista_detalhe.html',
                            lista=lista.data, itens=itens.data,
-                           total=total, contas=contas.data)
+                           total=total, contas=com_centavos(contas.data or [], 'saldo'),
+                           itens_offline=_itens_offline(itens.data),
+                           gerado_em=int(time.time() * 1000))
 
 
 @app.route('/lista/<int:id>/item', methods=['POST'])
 @login_required
+@altera_dados
 def adicionar_item_lista(id):
-    lista = supabase.table(TABLE_LISTAS)\
+    lista = get_supabase().table(TABLE_LISTAS)\
         .select('id, concluida')\
         .eq('id', id)\
         .eq('user_id', session['user_id'])\
@@ -794,20 +2348,93 @@ def adicionar_item_lista(id):
         flash('Nao e possivel adicionar item em lista concluida.', 'warning')
         return redirect(url_for('ver_lista', id=id))
 
-    supabase.table(TABLE_ITENS).insert({
+    item = {
         'lista_id':   id,
-        'descricao':  request.form['descricao'],
-        'valor':      float(request.form['valor']),
+        'descricao':  request.form['descricao'].strip(),
+        'valor':      reais(centavos(request.form['valor'])),
         'quantidade': int(request.form.get('quantidade', 1))
-    }).execute()
+    }
+    get_supabase().table(TABLE_ITENS).insert(item).execute()
+    registrar_no_catalogo(session['user_id'], [item])
     flash('Item adicionado!', 'success')
     return redirect(url_for('ver_lista', id=id))
 
 
+@app.route('/lista/<int:id>/itens-lote/previa', methods=['POST'])
+@login_required
+def previa_itens_lote(id):
+    itens, erros = _extrair_itens_em_lote(request.form.get('texto'))
+    return jsonify({
+        'itens': itens,
+        'erros': erros,
+        'total': reais(sum(centavos(i['valor']) * i['quantidade'] for i in itens))
+    })
+
+
+@app.route('/lista/<int:id>/itens-lote', methods=['POST'])
+@login_required
+@altera_dados
+def adicionar_itens_lote(id):
+    lista = get_supabase().table(TABLE_LISTAS)\
+        .select('id, concluida')\
+        .eq('id', id)\
+        .eq('user_id', session['user_id'])\
+        .single().execute()
+
+    if not lista.data:
+        flash('Lista nao encontrada.', 'danger')
+        return redirect(url_for('listas_compras'))
+
+    if lista.data.get('concluida'):
+        flash('Nao e possivel adicionar item em lista concluida.', 'warning')
+        return redirect(url_for('ver_lista', id=id))
+
+    itens, erros = _extrair_itens_em_lote(request.form.get('texto'))
+    if erros:
+        detalhes = '; '.join(
+            (f"linha {e['linha']}: " if e['linha'] else '') + e['erro'] for e in erros[:5]
+        )
+        flash(f'Nenhum item adicionado. Corrija: {detalhes}', 'danger')
+        return redirect(url_for('ver_lista', id=id))
+
+    if not itens:
+        flash('Informe ao menos um item.', 'warning')
+        return redirect(url_for('ver_lista', id=id))
+
+    payload = [{
+        'lista_id':   id,
+        'descricao':  item['descricao'].strip(),
+        'valor':      reais(centavos(item['valor'])),
+        'quantidade': int(item['quantidade'])
+    } for item in itens]
+
+    get_supabase().table(TABLE_ITENS).insert(payload).execute()
+    registrar_no_catalogo(session['user_id'], payload)
+    flash(f'{len(payload)} itens adicionados!', 'success')
+    return redirect(url_for('ver_lista', id=id))
+
+
+@app.route('/itens/sugestoes')
+@login_required
+def sugestoes_itens():
+    prefixo = (request.args.get('q') or '').strip()[:60]
+    try:
+        sugestoes = carregar_catalogo(session['user_id'])['trie'].buscar(prefixo)
+    except Exception as e:
+        return jsonify({'erro': f'Falha ao carregar sugestoes: {str(e)}'}), 500
+    return jsonify({'q': prefixo, 'sugestoes': [
+        {k: e[k] for k in ('descricao', 'ultimo_preco', 'preco_min', 'preco_medio')}
+        for e in sugestoes
+    ]})
+
+
 @app.route('/lista/<int:id>/importar-nota', methods=['POST'])
 @login_required
+@limitar_taxa('ocr')
+@controlar_admissao('ocr', vagas=_OCR_VAGAS, espera_sugerida=10, validade=2 * _OCR_TIMEOUT)
+@altera_dados
 def importar_nota_lista(id):
-    lista = supabase.table(TABLE_LISTAS)\
+    lista = get_supabase().table(TABLE_LISTAS)\
         .select('id, concluida')\
         .eq('id', id)\
         .eq('user_id', session['user_id'])\
@@ -821,28 +2448,30 @@ def importar_nota_lista(id):
         flash('Nao e possivel importar nota em lista concluida.', 'warning')
         return redirect(url_for('ver_lista', id=id))
 
-    arquivo = request.files.get('nota_fiscal')
-    if not arquivo or not arquivo.filename:
-        flash('Selecione uma imagem da nota fiscal.', 'warning')
+    arquivos = [a for a in request.files.getlist('nota_fiscal') if a and a.filename]
+    if not arquivos:
+        flash('Selecione uma imagem ou PDF da nota fiscal.', 'warning')
         return redirect(url_for('ver_lista', id=id))
 
-    extensoes = ('.jpg', '.jpeg', '.png', '.webp', '.bmp', '.tif', '.tiff')
-    if not arquivo.filename.lower().endswith(extensoes):
-        flash('Formato invalido. Use JPG, PNG, WEBP, BMP ou TIFF.', 'danger')
+    extensoes = ('.jpg', '.jpeg', '.png', '.webp', '.bmp', '.tif', '.tiff', '.pdf')
+    if any(not a.filename.lower().endswith(extensoes) for a in arquivos):
+        flash('Formato invalido. Use JPG, PNG, WEBP, BMP, TIFF ou PDF.', 'danger')
         return redirect(url_for('ver_lista', id=id))
 
     try:
-        itens_extraidos = _extrair_itens_por_ocr(arquivo.stream, arquivo.filename)
+        itens_extraidos = _extrair_itens_por_ocr([(a.read(), a.filename) for a in arquivos])
     except Exception as e:
         flash(f'Falha ao ler nota fiscal: {str(e)}', 'danger')
         return redirect(url_for('ver_lista', id=id))
 
+    itens_extraidos = corrigir_descricoes_ocr(session['user_id'], itens_extraidos)
+
     payload = []
     for item in itens_extraidos:
         payload.append({
             'lista_id': id,
-            'descricao': item['descricao'],
-            'valor': float(item['valor']),
+            'descricao': item['descricao'].strip(),
+            'valor': reais(centavos(item['valor'])),
             'quantidade': int(item['quantidade'])
         })
 
@@ -850,15 +2479,17 @@ def importar_nota_lista(id):
         flash('Nenhum item valido foi extraido da nota.', 'warning')
         return redirect(url_for('ver_lista', id=id))
 
-    supabase.table(TABLE_ITENS).insert(payload).execute()
+    get_supabase().table(TABLE_ITENS).insert(payload).execute()
+    registrar_no_catalogo(session['user_id'], payload)
     flash(f'{len(payload)} itens adicionados automaticamente pela nota fiscal.', 'success')
     return redirect(url_for('ver_lista', id=id))
 
 
 @app.route('/lista/<int:id>/item/<int:item_id>/deletar', methods=['POST'])
 @login_required
+@altera_dados
 def deletar_item_lista(id, item_id):
-    lista = supabase.table(TABLE_LISTAS)\
+    lista = get_supabase().table(TABLE_LISTAS)\
         .select('id, concluida')\
         .eq('id', id)\
         .eq('user_id', session['user_id'])\
@@ -872,7 +2503,7 @@ def deletar_item_lista(id, item_id):
         flash('Nao e possivel remover item de lista concluida.', 'warning')
         return redirect(url_for('ver_lista', id=id))
 
-    supabase.table(TABLE_ITENS)\
+    get_supabase().table(TABLE_ITENS)\
         .delete().eq('id', item_id)\
         .eq('lista_id', id).execute()
     flash('Item removido!', 'success')
@@ -881,8 +2512,9 @@ def deletar_item_lista(id, item_id):
 
 @app.route('/lista/<int:id>/item/<int:item_id>/editar', methods=['POST'])
 @login_required
+@altera_dados
 def editar_item_lista(id, item_id):
-    lista = supabase.table(TABLE_LISTAS)\
+    lista = get_supabase().table(TABLE_LISTAS)\
         .select('id, concluida')\
         .eq('id', id)\
         .eq('user_id', session['user_id'])\
@@ -898,7 +2530,7 @@ def editar_item_lista(id, item_id):
 
     descricao = request.form['descricao'].strip()
     quantidade = int(request.form.get('quantidade', 1))
-    valor = float(request.form.get('valor', 0))
+    valor = centavos(request.form.get('valor', 0))
 
     if not descricao:
         flash('Descricao do item e obrigatoria.', 'danger')
@@ -912,23 +2544,117 @@ def editar_item_lista(id, item_id):
         flash('Valor nao pode ser negativo.', 'danger')
         return redirect(url_for('ver_lista', id=id))
 
-    supabase.table(TABLE_ITENS).update({
+    get_supabase().table(TABLE_ITENS).update({
         'descricao': descricao,
         'quantidade': quantidade,
-        'valor': valor
+        'valor': reais(valor)
     }).eq('id', item_id).eq('lista_id', id).execute()
 
     flash('Item atualizado!', 'success')
     return redirect(url_for('ver_lista', id=id))
 
 
+# Fila offline (static/js/script.js): alterações feitas sem conexão chegam
+# em lote. Edições e remoções trazem a `base`, o item como o navegador o viu;
+# se ele mudou no servidor desde então, a operação volta como conflito.
+_OPERACOES_SYNC = ('adicionar', 'editar', 'deletar')
+
+def _itens_offline(itens):
+    return [{
+        'id': i['id'],
+        'descricao': (i['descricao'] or '').strip(),
+        'quantidade': int(i['quantidade']),
+        'valor': reais(centavos(i['valor']))
+    } for i in itens]
+
+def _campos_item_sync(dados):
+    descricao = str(dados.get('descricao') or '').strip()
+    quantidade = int(dados.get('quantidade', 1))
+    valor = centavos(dados.get('valor', 0))
+    if not descricao:
+        raise ValueError('Descricao do item e obrigatoria.')
+    if quantidade < 1:
+        raise ValueError('Quantidade deve ser maior que zero.')
+    if valor < 0:
+        raise ValueError('Valor nao pode ser negativo.')
+    return {'descricao': descricao, 'quantidade': quantidade, 'valor': reais(valor)}
+
+def _normalizar_operacao_sync(op):
+    """Valida uma operação da fila; devolve o dicionário enviado ao banco."""
+    if not isinstance(op, dict) or op.get('op') not in _OPERACOES_SYNC:
+        raise ValueError('Operacao desconhecida.')
+    cliente_id = str(op.get('cliente_id') or '')[:64]
+    if not cliente_id:
+        raise ValueError('Operacao sem cliente_id.')
+
+    normalizada = {'op': op['op'], 'cliente_id': cliente_id}
+    if op['op'] != 'deletar':
+        normalizada.update(_campos_item_sync(op))
+    if op['op'] != 'adicionar':
+        normalizada['id'] = int(op['id'])
+        if not isinstance(op.get('base'), dict):
+            raise ValueError('Operacao sem a versao base do item.')
+        normalizada['base'] = _campos_item_sync(op['base'])
+    return normalizada
+
+
+@app.route('/lista/<int:id>/itens/sincronizar', methods=['POST'])
+@login_required
+@altera_dados
+def sincronizar_itens_lista(id):
+    uid = session['user_id']
+    operacoes = (request.get_json(silent=True) or {}).get('operacoes')
+    if not isinstance(operacoes, list) or not operacoes:
+        return jsonify({'erro': 'Envie a lista de operacoes.'}), 400
+    if len(operacoes) > _MAX_ITENS_LOTE:
+        return jsonify({'erro': f'Envie no maximo {_MAX_ITENS_LOTE} operacoes por vez.'}), 413
+
+    validas, resultados = [], []
+    for op in operacoes:
+        try:
+            validas.append(_normalizar_operacao_sync(op))
+        except (KeyError, TypeError, ValueError) as e:
+            resultados.append({
+                'cliente_id': op.get('cliente_id') if isinstance(op, dict) else None,
+                'status': 'invalido',
+                'erro': str(e)
+            })
+
+    if validas:
+        try:
+            res = get_supabase().rpc('p01cf_sincronizar_itens', {
+                'p_user_id': uid, 'p_lista_id': id, 'p_operacoes': validas
+            }).execute()
+        except Exception as e:
+            return jsonify({'erro': f'Lista indisponivel para sincronizar: {str(e)}'}), 409
+        aplicadas = res.data or []
+        resultados.extend(aplicadas)
+
+        ok = {r['cliente_id'] for r in aplicadas if r.get('status') == 'ok' and not r.get('repetido')}
+        registrar_no_catalogo(uid, [
+            op for op in validas if op['op'] != 'deletar' and op['cliente_id'] in ok
+        ])
+
+    itens = get_supabase().table(TABLE_ITENS)\
+        .select('id, descricao, quantidade, valor')\
+        .eq('lista_id', id)\
+        .order('id').execute()
+
+    return jsonify({
+        'resultados': resultados,
+        'itens': _itens_offline(itens.data or []),
+        'gerado_em': int(time.time() * 1000)
+    })
+
+
 @app.route('/lista/<int:id>/pagar', methods=['POST'])
 @login_required
+@altera_dados
 def pagar_lista(id):
     conta_id = int(request.form['conta_id'])
     uid      = session['user_id']
 
-    lista = supabase.table(TABLE_LISTAS).select('*').eq('id', id).eq('user_id', uid).single().execute()
+    lista = get_supabase().table(TABLE_LISTAS).select('*').eq('id', id).eq('user_id', uid).single().execute()
     if not lista.data:
         flash('Lista nao encontrada.', 'danger')
         return redirect(url_for('listas_compras'))
@@ -937,8 +2663,8 @@ def pagar_lista(id):
         flash('Essa lista ja foi concluida.', 'warning')
         return redirect(url_for('ver_lista', id=id))
 
-    itens = supabase.table(TABLE_ITENS).select('*').eq('lista_id', id).execute()
-    itens_lista = itens.data or []
+    itens = get_supabase().table(TABLE_ITENS).select('*').eq('lista_id', id).execute()
+    itens_lista = com_centavos(itens.data or [], 'valor')
 
     selected_raw = request.form.get('selected_item_ids', '').strip()
     selected_ids = set()
@@ -956,12 +2682,12 @@ def pagar_lista(id):
     else:
         itens_pagamento = itens_lista
 
-    total = sum(float(i['valor']) * i['quantidade'] for i in itens_pagamento)
+    total = sum(i['valor_centavos'] * i['quantidade'] for i in itens_pagamento)
     if total <= 0:
         flash('Nao ha valor valido para pagamento.', 'warning')
         return redirect(url_for('ver_lista', id=id))
 
-    conta = supabase.table(TABLE_CONTAS)\
+    conta = get_supabase().table(TABLE_CONTAS)\
         .select('*').eq('id', conta_id)\
         .eq('user_id', uid).single().execute()
 
@@ -969,13 +2695,14 @@ def pagar_lista(id):
         flash('Conta nao encontrada.', 'danger')
         return redirect(url_for('ver_lista', id=id))
 
-    if float(conta.data['saldo']) < total:
+    saldo = centavos(conta.data['saldo'])
+    if saldo < total:
         flash('Saldo insuficiente nesta conta!', 'danger')
         return redirect(url_for('ver_lista', id=id))
 
     desc = 'Lista: ' + lista.data['nome']
-    supabase.table(TABLE_TRANSACOES).insert({
-        'conta_id': conta_id, 'tipo': 'saida', 'valor': total, 'descricao': desc
+    get_supabase().table(TABLE_TRANSACOES).insert({
+        'conta_id': conta_id, 'tipo': 'saida', 'valor': reais(total), 'descricao': desc
     }).execute()
 
     # Se o usuario marcou apenas parte dos itens, remove os nao selecionados.
@@ -983,35 +2710,27 @@ def pagar_lista(id):
         ids_selecionados = {int(i['id']) for i in itens_pagamento}
         ids_nao_selecionados = [int(i['id']) for i in itens_lista if int(i['id']) not in ids_selecionados]
         if ids_nao_selecionados:
-            supabase.table(TABLE_ITENS).delete().eq('lista_id', id).in_('id', ids_nao_selecionados).execute()
+            get_supabase().table(TABLE_ITENS).delete().eq('lista_id', id).in_('id', ids_nao_selecionados).execute()
 
-    supabase.table(TABLE_CONTAS).update({'saldo': float(conta.data['saldo']) - total}).eq('id', conta_id).execute()
-    supabase.table(TABLE_LISTAS).update({
+    get_supabase().table(TABLE_CONTAS).update({'saldo': reais(saldo - total)}).eq('id', conta_id).execute()
+    get_supabase().table(TABLE_LISTAS).update({
         'concluida': True, 'conta_id': conta_id,
         'data_conclusao': datetime.now().isoformat()
     }).eq('id', id).execute()
 
-    flash(f'Lista paga! R$ {total:.2f} debitado de {conta.data["nome"]}', 'success')
+    flash(f'Lista paga! R$ {_formatar_centavos(total)} debitado de {conta.data["nome"]}', 'success')
     return redirect(url_for('listas_compras'))
 
 
 @app.route('/lista/<int:id>/deletar', methods=['POST'])
 @login_required
+@altera_dados
 def deletar_lista(id):
-    uid = session['user_id']
     try:
-        lista = supabase.table(TABLE_LISTAS)\
-            .select('id')\
-            .eq('id', id)\
-            .eq('user_id', uid).single().execute()
-
-        if not lista.data:
+        if aplicar_em_lote(TABLE_LISTAS, 'p01cf_excluir_listas', session['user_id'], [id], 'deletar'):
+            flash('Lista deletada!', 'success')
+        else:
             flash('Lista nao encontrada.', 'danger')
-            return redirect(url_for('listas_compras'))
-
-        supabase.table(TABLE_ITENS).delete().eq('lista_id', id).execute()
-        supabase.table(TABLE_LISTAS).delete().eq('id', id).eq('user_id', uid).execute()
-        flash('Lista deletada!', 'success')
     except Exception as e:
         flash(f'Nao foi possivel deletar a lista: {str(e)}', 'danger')
     return redirect(url_for('listas_compras'))
@@ -1020,8 +2739,13 @@ def deletar_lista(id):
 # ============================================================
 # INICIALIZAÇÃO
 # ============================================================
+# Com `PRELOAD_APP=1` o gunicorn importa o app antes do fork (ver
+# gunicorn.conf.py); os workers herdam módulos e templates já compilados.
+if os.getenv('PRELOAD_APP') == '1':
+    preaquecer()
+
 if __name__ == '__main__':
-    if init_supabase():
+    if get_supabase() is not None:
         print("✅ Supabase conectado!")
     else:
         print("❌ Erro: Configure SUPABASE_URL e SUPABASE_KEY no arquivo .env")
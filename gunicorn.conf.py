@@ -0,0 +1,7 @@
+# Configuração lida automaticamente pelo gunicorn (arquivo na pasta do app).
+import os
+
+# PRELOAD_APP=1 importa app.py no processo mestre antes do fork, de modo que
+# os workers compartilham módulos e templates já carregados (copy-on-write).
+# O cliente Supabase continua sendo criado por worker, no primeiro uso.
+preload_app = os.getenv('PRELOAD_APP') == '1'
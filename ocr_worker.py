@@ -0,0 +1,31 @@
+# OCR executado nos processos do pool de app.py.
+# Fica fora de app.py de propósito: os filhos do pool ("spawn") importam só
+# este módulo, sem montar o Flask nem rodar preaquecer() com PRELOAD_APP=1.
+import io
+import os
+
+
+def ocr_texto_pagina(conteudo, suffix, pagina=0):
+    """Rasteriza a página (se PDF) e devolve o texto lido."""
+    try:
+        from PIL import Image, ImageOps
+        import pytesseract
+    except ImportError as e:
+        raise RuntimeError(
+            'Dependencias OCR ausentes. Instale com: pip install pillow pytesseract'
+        ) from e
+
+    try:
+        if suffix == '.pdf':
+            import pypdfium2 as pdfium
+            pdf = pdfium.PdfDocument(conteudo)
+            try:
+                img = pdf[pagina].render(scale=300 / 72).to_pil()
+            finally:
+                pdf.close()
+        else:
+            img = Image.open(io.BytesIO(conteudo))
+        img = ImageOps.grayscale(img)
+        return pytesseract.image_to_string(img, lang=os.getenv('OCR_LANG', 'por+eng'))
+    except Exception as e:
+        raise RuntimeError(f'Erro ao processar OCR da pagina {pagina + 1}: {e}') from e
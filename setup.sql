@@ -10,9 +10,13 @@ CREATE TABLE IF NOT EXISTS p01cf_usuarios (
     nome          TEXT NOT NULL,
     email         TEXT NOT NULL UNIQUE,
     senha         TEXT NOT NULL,
-    data_cadastro TIMESTAMP DEFAULT NOW()
+    data_cadastro TIMESTAMP DEFAULT NOW(),
+    versao_dados  BIGINT DEFAULT 0
 );
 
+-- Bancos criados antes da coluna de versão (usada no ETag das páginas)
+ALTER TABLE p01cf_usuarios ADD COLUMN IF NOT EXISTS versao_dados BIGINT DEFAULT 0;
+
 -- TABELA: contas (com user_id)
 CREATE TABLE IF NOT EXISTS p01cf_contas (
     id            BIGSERIAL PRIMARY KEY,
@@ -22,7 +26,8 @@ CREATE TABLE IF NOT EXISTS p01cf_contas (
     categoria     TEXT NOT NULL,
     saldo         DECIMAL(10,2) DEFAULT 0,
     cor           TEXT DEFAULT '#007bff',
-    data_criacao  TIMESTAMP DEFAULT NOW()
+    data_criacao  TIMESTAMP DEFAULT NOW(),
+    arquivada     BOOLEAN NOT NULL DEFAULT FALSE
 );
 
 -- TABELA: transações
@@ -43,9 +48,14 @@ CREATE TABLE IF NOT EXISTS p01cf_listas_compras (
     data_criacao     TIMESTAMP DEFAULT NOW(),
     concluida        BOOLEAN DEFAULT FALSE,
     conta_id         BIGINT REFERENCES p01cf_contas(id),
-    data_conclusao   TIMESTAMP
+    data_conclusao   TIMESTAMP,
+    arquivada        BOOLEAN NOT NULL DEFAULT FALSE
 );
 
+-- Bancos criados antes do arquivamento em lote (contas e listas)
+ALTER TABLE p01cf_contas         ADD COLUMN IF NOT EXISTS arquivada BOOLEAN NOT NULL DEFAULT FALSE;
+ALTER TABLE p01cf_listas_compras ADD COLUMN IF NOT EXISTS arquivada BOOLEAN NOT NULL DEFAULT FALSE;
+
 -- TABELA: itens da lista
 CREATE TABLE IF NOT EXISTS p01cf_itens_lista (
     id          BIGSERIAL PRIMARY KEY,
@@ -84,3 +94,431 @@ CREATE INDEX IF NOT EXISTS idx_trans_conta    ON p01cf_transacoes(conta_id);
 CREATE INDEX IF NOT EXISTS idx_listas_user    ON p01cf_listas_compras(user_id);
 CREATE INDEX IF NOT EXISTS idx_itens_lista    ON p01cf_itens_lista(lista_id);
 CREATE INDEX IF NOT EXISTS idx_usuarios_email ON p01cf_usuarios(email);
+
+-- =============================================================
+-- BUSCA POR DESCRIÇÃO (pg_trgm)
+-- Índices GIN de trigramas: a busca por semelhança usa o índice em vez de
+-- varrer transações e itens inteiros.
+-- =============================================================
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_trans_descricao_trgm ON p01cf_transacoes  USING GIN (descricao gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_itens_descricao_trgm ON p01cf_itens_lista USING GIN (descricao gin_trgm_ops);
+
+-- Resultados ordenados por semelhança, limitados às contas e listas do usuário.
+CREATE OR REPLACE FUNCTION p01cf_buscar(
+    p_user_id BIGINT,
+    p_termo   TEXT,
+    p_limite  INT DEFAULT 20,
+    p_offset  INT DEFAULT 0
+)
+RETURNS TABLE (
+    origem          TEXT,
+    id              BIGINT,
+    descricao       TEXT,
+    valor           DECIMAL(10,2),
+    data            TIMESTAMP,
+    referencia_id   BIGINT,
+    referencia_nome TEXT,
+    score           REAL
+)
+LANGUAGE sql STABLE AS $$
+    SELECT r.*
+    FROM (
+        SELECT 'transacao'::TEXT AS origem, t.id, t.descricao, t.valor, t.data,
+               c.id AS referencia_id, c.nome AS referencia_nome,
+               word_similarity(p_termo, t.descricao) AS score
+        FROM p01cf_transacoes t
+        JOIN p01cf_contas c ON c.id = t.conta_id
+        WHERE c.user_id = p_user_id
+          AND p_termo <% t.descricao
+        UNION ALL
+        SELECT 'item'::TEXT, i.id, i.descricao, i.valor, l.data_criacao,
+               l.id, l.nome,
+               word_similarity(p_termo, i.descricao)
+        FROM p01cf_itens_lista i
+        JOIN p01cf_listas_compras l ON l.id = i.lista_id
+        WHERE l.user_id = p_user_id
+          AND p_termo <% i.descricao
+    ) r
+    ORDER BY r.score DESC, r.data DESC NULLS LAST, r.id DESC
+    LIMIT p_limite OFFSET p_offset;
+$$;
+
+-- =============================================================
+-- CATÁLOGO DE ITENS POR USUÁRIO (autocomplete + histórico de preços)
+-- Atualizado de forma incremental a cada item adicionado/importado.
+-- =============================================================
+CREATE TABLE IF NOT EXISTS p01cf_catalogo_itens (
+    id            BIGSERIAL PRIMARY KEY,
+    user_id       BIGINT NOT NULL REFERENCES p01cf_usuarios(id) ON DELETE CASCADE,
+    chave         TEXT NOT NULL,
+    descricao     TEXT NOT NULL,
+    ultimo_preco  DECIMAL(10,2) NOT NULL,
+    preco_min     DECIMAL(10,2) NOT NULL,
+    soma_precos   DECIMAL(14,2) NOT NULL DEFAULT 0,
+    ocorrencias   INTEGER NOT NULL DEFAULT 0,
+    atualizado_em TIMESTAMP DEFAULT NOW(),
+    UNIQUE (user_id, chave)
+);
+
+ALTER TABLE p01cf_catalogo_itens ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS "Permitir tudo" ON p01cf_catalogo_itens;
+CREATE POLICY "Permitir tudo" ON p01cf_catalogo_itens FOR ALL USING (true);
+
+-- Recebe os itens já agregados por chave (uma linha por chave no lote).
+CREATE OR REPLACE FUNCTION p01cf_catalogo_registrar(p_user_id BIGINT, p_itens JSONB)
+RETURNS VOID
+LANGUAGE sql AS $$
+    INSERT INTO p01cf_catalogo_itens AS c
+        (user_id, chave, descricao, ultimo_preco, preco_min, soma_precos, ocorrencias)
+    SELECT p_user_id, x.chave, x.descricao, x.ultimo_preco, x.preco_min, x.soma_precos, x.ocorrencias
+    FROM jsonb_to_recordset(p_itens) AS x(
+        chave TEXT, descricao TEXT, ultimo_preco DECIMAL, preco_min DECIMAL,
+        soma_precos DECIMAL, ocorrencias INTEGER
+    )
+    ON CONFLICT (user_id, chave) DO UPDATE SET
+        descricao     = EXCLUDED.descricao,
+        ultimo_preco  = EXCLUDED.ultimo_preco,
+        preco_min     = LEAST(c.preco_min, EXCLUDED.preco_min),
+        soma_precos   = c.soma_precos + EXCLUDED.soma_precos,
+        ocorrencias   = c.ocorrencias + EXCLUDED.ocorrencias,
+        atualizado_em = NOW();
+$$;
+
+-- =============================================================
+-- TRANSAÇÕES RECORRENTES
+-- Regras (aluguel, assinaturas...) materializadas pelo comando
+-- `flask --app app materializar-recorrencias` (agendar no cron).
+-- =============================================================
+CREATE TABLE IF NOT EXISTS p01cf_recorrencias (
+    id              BIGSERIAL PRIMARY KEY,
+    user_id         BIGINT NOT NULL REFERENCES p01cf_usuarios(id) ON DELETE CASCADE,
+    conta_id        BIGINT NOT NULL REFERENCES p01cf_contas(id) ON DELETE CASCADE,
+    tipo            TEXT NOT NULL,
+    valor           DECIMAL(10,2) NOT NULL,
+    descricao       TEXT NOT NULL,
+    frequencia      TEXT NOT NULL DEFAULT 'mensal',
+    dia             INTEGER NOT NULL,
+    proxima_data    DATE NOT NULL,
+    data_fim        DATE,
+    ativa           BOOLEAN DEFAULT TRUE,
+    data_criacao    TIMESTAMP DEFAULT NOW()
+);
+
+ALTER TABLE p01cf_recorrencias ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS "Permitir tudo" ON p01cf_recorrencias;
+CREATE POLICY "Permitir tudo" ON p01cf_recorrencias FOR ALL USING (true);
+
+CREATE INDEX IF NOT EXISTS idx_recorrencias_conta   ON p01cf_recorrencias(conta_id);
+CREATE INDEX IF NOT EXISTS idx_recorrencias_proxima ON p01cf_recorrencias(proxima_data) WHERE ativa;
+
+-- Cada ocorrência (regra + competência) vira no máximo uma transação.
+ALTER TABLE p01cf_transacoes ADD COLUMN IF NOT EXISTS recorrencia_id BIGINT REFERENCES p01cf_recorrencias(id) ON DELETE SET NULL;
+ALTER TABLE p01cf_transacoes ADD COLUMN IF NOT EXISTS competencia DATE;
+CREATE UNIQUE INDEX IF NOT EXISTS uq_trans_recorrencia ON p01cf_transacoes(recorrencia_id, competencia);
+
+-- Lança um lote de ocorrências numa única transação: insere ignorando as já
+-- lançadas, ajusta o saldo uma vez por conta no lote (só pelo que foi
+-- inserido) e avança a próxima data das regras. Reexecutar o mesmo lote não
+-- duplica nada. O comando pode enviar vários lotes por execução; uma conta
+-- presente em mais de um recebe um ajuste em cada.
+CREATE OR REPLACE FUNCTION p01cf_lancar_recorrencias(p_lancamentos JSONB, p_proximas JSONB)
+RETURNS INTEGER
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_inseridas INTEGER;
+BEGIN
+    WITH novos AS (
+        INSERT INTO p01cf_transacoes (conta_id, tipo, valor, descricao, data, recorrencia_id, competencia)
+        SELECT x.conta_id, x.tipo, x.valor, x.descricao, x.competencia::TIMESTAMP, x.recorrencia_id, x.competencia
+        FROM jsonb_to_recordset(p_lancamentos) AS x(
+            conta_id BIGINT, tipo TEXT, valor DECIMAL, descricao TEXT,
+            recorrencia_id BIGINT, competencia DATE
+        )
+        ON CONFLICT (recorrencia_id, competencia) DO NOTHING
+        RETURNING conta_id, tipo, valor
+    ), ajustes AS (
+        SELECT conta_id,
+               SUM(CASE WHEN tipo = 'entrada' THEN valor ELSE -valor END) AS delta,
+               COUNT(*) AS qtd
+        FROM novos
+        GROUP BY conta_id
+    ), saldos AS (
+        UPDATE p01cf_contas c
+        SET saldo = c.saldo + a.delta
+        FROM ajustes a
+        WHERE c.id = a.conta_id
+        RETURNING a.qtd
+    )
+    SELECT COALESCE(SUM(qtd), 0) INTO v_inseridas FROM saldos;
+
+    UPDATE p01cf_recorrencias r
+    SET proxima_data = p.proxima_data,
+        ativa = p.ativa
+    FROM jsonb_to_recordset(p_proximas) AS p(id BIGINT, proxima_data DATE, ativa BOOLEAN)
+    WHERE r.id = p.id AND (r.proxima_data < p.proxima_data OR NOT p.ativa);
+
+    RETURN v_inseridas;
+END;
+$$;
+
+-- =============================================================
+-- CONCILIAÇÃO DE SALDOS
+-- Checkpoint por conta usado por `flask --app app conciliar-saldos`:
+-- a última transação verificada e o saldo esperado até ela.
+-- =============================================================
+CREATE TABLE IF NOT EXISTS p01cf_conciliacao (
+    conta_id             BIGINT PRIMARY KEY REFERENCES p01cf_contas(id) ON DELETE CASCADE,
+    ultima_transacao_id  BIGINT NOT NULL DEFAULT 0,
+    saldo_verificado     DECIMAL(14,2) NOT NULL,
+    divergencia          DECIMAL(14,2) NOT NULL DEFAULT 0,
+    verificado_em        TIMESTAMP DEFAULT NOW()
+);
+
+ALTER TABLE p01cf_conciliacao ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS "Permitir tudo" ON p01cf_conciliacao;
+CREATE POLICY "Permitir tudo" ON p01cf_conciliacao FOR ALL USING (true);
+
+CREATE INDEX IF NOT EXISTS idx_conciliacao_ultima ON p01cf_conciliacao(ultima_transacao_id);
+
+-- Cursor da varredura: última transação cujo lote já teve os checkpoints
+-- gravados. Só avança depois do upsert do lote, então contas novas e
+-- execuções interrompidas (--max-lotes) não pulam transações.
+CREATE TABLE IF NOT EXISTS p01cf_conciliacao_cursor (
+    id                   SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    ultima_transacao_id  BIGINT NOT NULL DEFAULT 0,
+    atualizado_em        TIMESTAMP DEFAULT NOW()
+);
+
+ALTER TABLE p01cf_conciliacao_cursor ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS "Permitir tudo" ON p01cf_conciliacao_cursor;
+CREATE POLICY "Permitir tudo" ON p01cf_conciliacao_cursor FOR ALL USING (true);
+
+-- Bancos que já tinham checkpoints retomam do menor deles (seguro: cada
+-- conta ignora transações até o próprio checkpoint).
+INSERT INTO p01cf_conciliacao_cursor (id, ultima_transacao_id)
+SELECT 1, COALESCE(MIN(ultima_transacao_id), 0) FROM p01cf_conciliacao
+ON CONFLICT (id) DO NOTHING;
+
+-- Contas ainda sem checkpoint recebem a linha de base na posição do cursor:
+-- o saldo atual menos o efeito das transações posteriores a ele, que a
+-- varredura ainda vai somar.
+CREATE OR REPLACE FUNCTION p01cf_conciliacao_iniciar()
+RETURNS INTEGER
+LANGUAGE sql AS $$
+    WITH cursor AS (
+        SELECT COALESCE(MAX(ultima_transacao_id), 0) AS id
+        FROM p01cf_conciliacao_cursor WHERE id = 1
+    ), novos AS (
+        INSERT INTO p01cf_conciliacao (conta_id, ultima_transacao_id, saldo_verificado)
+        SELECT c.id,
+               cursor.id,
+               c.saldo - COALESCE((
+                   SELECT SUM(CASE WHEN t.tipo = 'entrada' THEN t.valor ELSE -t.valor END)
+                   FROM p01cf_transacoes t
+                   WHERE t.conta_id = c.id AND t.id > cursor.id
+               ), 0)
+        FROM p01cf_contas c, cursor
+        WHERE NOT EXISTS (SELECT 1 FROM p01cf_conciliacao k WHERE k.conta_id = c.id)
+        ON CONFLICT (conta_id) DO NOTHING
+        RETURNING 1
+    )
+    SELECT COUNT(*)::INTEGER FROM novos;
+$$;
+
+-- Ajuste relativo (saldo + delta): não sobrescreve escritas concorrentes.
+-- Também avança a versão de dados dos donos, invalidando ETag e cache.
+CREATE OR REPLACE FUNCTION p01cf_ajustar_saldos(p_ajustes JSONB)
+RETURNS VOID
+LANGUAGE sql AS $$
+    WITH ajustadas AS (
+        UPDATE p01cf_contas c
+        SET saldo = c.saldo + a.delta
+        FROM jsonb_to_recordset(p_ajustes) AS a(conta_id BIGINT, delta DECIMAL)
+        WHERE c.id = a.conta_id
+        RETURNING c.user_id
+    )
+    UPDATE p01cf_usuarios u
+    SET versao_dados = (EXTRACT(EPOCH FROM clock_timestamp()) * 1000000000)::BIGINT
+    WHERE u.id IN (SELECT user_id FROM ajustadas);
+$$;
+
+-- =============================================================
+-- GRÁFICOS (séries diárias agregadas no banco)
+-- =============================================================
+-- O app recebe um ponto por dia com movimento e reduz a série (LTTB)
+-- ao número de pontos pedido pelo gráfico.
+CREATE INDEX IF NOT EXISTS idx_trans_conta_data ON p01cf_transacoes(conta_id, data);
+
+-- Saldo ao fim de cada dia, reconstruído de trás para frente a partir do
+-- saldo atual (o saldo inicial da conta não gera transação).
+-- p_conta_id NULL soma todas as contas do usuário.
+CREATE OR REPLACE FUNCTION p01cf_serie_saldo(
+    p_user_id  BIGINT,
+    p_conta_id BIGINT DEFAULT NULL
+)
+RETURNS TABLE (dia DATE, saldo DECIMAL(14,2))
+LANGUAGE sql STABLE AS $$
+    WITH contas AS (
+        SELECT c.id, c.saldo
+        FROM p01cf_contas c
+        WHERE c.user_id = p_user_id
+          AND (c.id = p_conta_id OR (p_conta_id IS NULL AND NOT c.arquivada))
+    ), diario AS (
+        SELECT t.data::DATE AS dia,
+               SUM(CASE WHEN t.tipo = 'entrada' THEN t.valor ELSE -t.valor END) AS delta
+        FROM p01cf_transacoes t
+        JOIN contas c ON c.id = t.conta_id
+        GROUP BY 1
+    )
+    SELECT d.dia,
+           (SELECT COALESCE(SUM(saldo), 0) FROM contas)
+           - COALESCE(SUM(d.delta) OVER (
+                 ORDER BY d.dia DESC ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+             ), 0)
+    FROM diario d
+    ORDER BY d.dia;
+$$;
+
+-- Saídas por categoria de conta, somadas por dia, semana ou mês.
+CREATE OR REPLACE FUNCTION p01cf_serie_gastos(
+    p_user_id BIGINT,
+    p_periodo TEXT DEFAULT 'day'
+)
+RETURNS TABLE (dia DATE, categoria TEXT, total DECIMAL(14,2))
+LANGUAGE sql STABLE AS $$
+    SELECT date_trunc(p_periodo, t.data)::DATE, c.categoria, SUM(t.valor)
+    FROM p01cf_transacoes t
+    JOIN p01cf_contas c ON c.id = t.conta_id
+    WHERE c.user_id = p_user_id
+      AND NOT c.arquivada
+      AND t.tipo = 'saida'
+    GROUP BY 1, 2
+    ORDER BY 1, 2;
+$$;
+
+-- =============================================================
+-- SINCRONIZAÇÃO OFFLINE DE ITENS (fila da PWA)
+-- =============================================================
+-- Itens criados offline trazem um id gerado no navegador (cliente_id); o
+-- índice único torna o reenvio do mesmo lote idempotente.
+ALTER TABLE p01cf_itens_lista ADD COLUMN IF NOT EXISTS cliente_id TEXT;
+CREATE UNIQUE INDEX IF NOT EXISTS uq_itens_cliente ON p01cf_itens_lista(lista_id, cliente_id);
+
+-- Aplica o lote na ordem recebida, numa única transação. Edições e remoções
+-- trazem a `base` (o item como o navegador o viu): se o item mudou desde
+-- então, a operação não é aplicada e volta como conflito com o valor atual.
+CREATE OR REPLACE FUNCTION p01cf_sincronizar_itens(
+    p_user_id    BIGINT,
+    p_lista_id   BIGINT,
+    p_operacoes  JSONB
+)
+RETURNS JSONB
+LANGUAGE plpgsql AS $$
+DECLARE
+    op         JSONB;
+    atual      p01cf_itens_lista%ROWTYPE;
+    novo_id    BIGINT;
+    resultados JSONB := '[]'::JSONB;
+BEGIN
+    PERFORM 1 FROM p01cf_listas_compras
+    WHERE id = p_lista_id AND user_id = p_user_id AND NOT concluida
+    FOR UPDATE;
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'Lista % inexistente ou concluida', p_lista_id;
+    END IF;
+
+    FOR op IN SELECT * FROM jsonb_array_elements(p_operacoes) LOOP
+        IF op->>'op' = 'adicionar' THEN
+            novo_id := NULL;
+            INSERT INTO p01cf_itens_lista (lista_id, descricao, quantidade, valor, cliente_id)
+            VALUES (p_lista_id, op->>'descricao', (op->>'quantidade')::INTEGER,
+                    (op->>'valor')::DECIMAL(10,2), op->>'cliente_id')
+            ON CONFLICT (lista_id, cliente_id) DO NOTHING
+            RETURNING id INTO novo_id;
+            IF novo_id IS NOT NULL THEN
+                resultados := resultados || jsonb_build_object(
+                    'cliente_id', op->>'cliente_id', 'status', 'ok', 'id', novo_id);
+            ELSE
+                -- Reenvio de um lote que já tinha sido gravado.
+                SELECT id INTO novo_id FROM p01cf_itens_lista
+                WHERE lista_id = p_lista_id AND cliente_id = op->>'cliente_id';
+                resultados := resultados || jsonb_build_object(
+                    'cliente_id', op->>'cliente_id', 'status', 'ok', 'id', novo_id, 'repetido', TRUE);
+            END IF;
+            CONTINUE;
+        END IF;
+
+        SELECT * INTO atual FROM p01cf_itens_lista
+        WHERE id = (op->>'id')::BIGINT AND lista_id = p_lista_id
+        FOR UPDATE;
+
+        IF NOT FOUND THEN
+            -- Remover algo que já não existe tem o mesmo efeito; editar, não.
+            resultados := resultados || jsonb_build_object(
+                'cliente_id', op->>'cliente_id', 'id', (op->>'id')::BIGINT,
+                'status', CASE WHEN op->>'op' = 'deletar' THEN 'ok' ELSE 'conflito' END,
+                'atual', NULL);
+        -- A descrição é comparada sem espaços nas pontas dos dois lados:
+        -- linhas antigas podem ter sido gravadas sem o strip.
+        ELSIF btrim(atual.descricao) IS DISTINCT FROM btrim(op->'base'->>'descricao')
+           OR atual.quantidade IS DISTINCT FROM (op->'base'->>'quantidade')::INTEGER
+           OR atual.valor      IS DISTINCT FROM (op->'base'->>'valor')::DECIMAL(10,2) THEN
+            resultados := resultados || jsonb_build_object(
+                'cliente_id', op->>'cliente_id', 'id', atual.id, 'status', 'conflito',
+                'atual', jsonb_build_object('id', atual.id, 'descricao', atual.descricao,
+                                            'quantidade', atual.quantidade, 'valor', atual.valor));
+        ELSIF op->>'op' = 'deletar' THEN
+            DELETE FROM p01cf_itens_lista WHERE id = atual.id;
+            resultados := resultados || jsonb_build_object(
+                'cliente_id', op->>'cliente_id', 'id', atual.id, 'status', 'ok');
+        ELSE
+            UPDATE p01cf_itens_lista
+            SET descricao  = op->>'descricao',
+                quantidade = (op->>'quantidade')::INTEGER,
+                valor      = (op->>'valor')::DECIMAL(10,2)
+            WHERE id = atual.id;
+            resultados := resultados || jsonb_build_object(
+                'cliente_id', op->>'cliente_id', 'id', atual.id, 'status', 'ok');
+        END IF;
+    END LOOP;
+
+    RETURN resultados;
+END;
+$$;
+
+-- =============================================================
+-- OPERAÇÕES EM LOTE (contas e listas)
+-- =============================================================
+-- Arquivar (coluna `arquivada`) tira contas e listas do painel e das listas
+-- de compras mantendo o histórico; excluir é definitivo.
+-- Uma única instrução: transações, recorrências e checkpoints saem pelo
+-- ON DELETE CASCADE e as listas pagas com a conta perdem a referência no
+-- mesmo comando (a FK de conta_id é verificada só no fim da instrução).
+CREATE OR REPLACE FUNCTION p01cf_excluir_contas(p_user_id BIGINT, p_ids BIGINT[])
+RETURNS INTEGER
+LANGUAGE sql AS $$
+    WITH desvinculadas AS (
+        UPDATE p01cf_listas_compras
+        SET conta_id = NULL
+        WHERE user_id = p_user_id AND conta_id = ANY(p_ids)
+    ), removidas AS (
+        DELETE FROM p01cf_contas
+        WHERE user_id = p_user_id AND id = ANY(p_ids)
+        RETURNING 1
+    )
+    SELECT COUNT(*)::INTEGER FROM removidas;
+$$;
+
+-- Itens saem pelo ON DELETE CASCADE.
+CREATE OR REPLACE FUNCTION p01cf_excluir_listas(p_user_id BIGINT, p_ids BIGINT[])
+RETURNS INTEGER
+LANGUAGE sql AS $$
+    WITH removidas AS (
+        DELETE FROM p01cf_listas_compras
+        WHERE user_id = p_user_id AND id = ANY(p_ids)
+        RETURNING 1
+    )
+    SELECT COUNT(*)::INTEGER FROM removidas;
+$$;
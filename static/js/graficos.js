@@ -0,0 +1,73 @@
+// Gráficos de saldo e gastos (dados de /graficos/*, já reduzidos no servidor)
+const CORES_GRAFICO = ['#0d6efd', '#dc3545', '#198754', '#fd7e14', '#6f42c1', '#20c997', '#ffc107', '#6c757d'];
+
+function pontosGrafico(pontos) {
+    return pontos.map(p => ({ x: Date.parse(p.data + 'T00:00:00'), y: p.valor }));
+}
+
+function opcoesGrafico() {
+    return {
+        responsive: true,
+        maintainAspectRatio: false,
+        parsing: false,
+        interaction: { mode: 'nearest', intersect: false },
+        scales: {
+            x: {
+                type: 'linear',
+                ticks: { callback: valor => new Date(valor).toLocaleDateString('pt-BR') }
+            },
+            y: {
+                ticks: { callback: valor => 'R$ ' + Number(valor).toFixed(2) }
+            }
+        },
+        plugins: {
+            tooltip: {
+                callbacks: {
+                    title: itens => new Date(itens[0].parsed.x).toLocaleDateString('pt-BR'),
+                    label: item => item.dataset.label + ': R$ ' + item.parsed.y.toFixed(2)
+                }
+            }
+        }
+    };
+}
+
+function larguraEmPontos(canvas) {
+    // Um ponto a cada ~4px basta; o servidor limita o máximo.
+    return Math.max(20, Math.round(canvas.clientWidth / 4));
+}
+
+function desenharGrafico(canvas, datasets) {
+    const aviso = canvas.parentElement.querySelector('.grafico-vazio');
+    if (!datasets.some(d => d.data.length)) {
+        if (aviso) aviso.classList.remove('d-none');
+        return;
+    }
+    new Chart(canvas, { type: 'line', data: { datasets }, options: opcoesGrafico() });
+}
+
+function carregarGraficoSaldo(canvas, contaId, cor) {
+    const params = new URLSearchParams({ pontos: larguraEmPontos(canvas) });
+    if (contaId) params.set('conta', contaId);
+    return fetch('/graficos/saldo?' + params, { credentials: 'same-origin' })
+        .then(r => r.json())
+        .then(dados => desenharGrafico(canvas, [{
+            label: 'Saldo',
+            data: pontosGrafico(dados.pontos || []),
+            borderColor: cor || CORES_GRAFICO[0],
+            pointRadius: 0,
+            tension: 0.2
+        }]));
+}
+
+function carregarGraficoGastos(canvas, periodo) {
+    const params = new URLSearchParams({ pontos: larguraEmPontos(canvas), periodo: periodo || 'semana' });
+    return fetch('/graficos/gastos?' + params, { credentials: 'same-origin' })
+        .then(r => r.json())
+        .then(dados => desenharGrafico(canvas, Object.entries(dados.series || {}).map(([categoria, pontos], i) => ({
+            label: categoria,
+            data: pontosGrafico(pontos),
+            borderColor: CORES_GRAFICO[i % CORES_GRAFICO.length],
+            pointRadius: 0,
+            tension: 0.2
+        }))));
+}
@@ -69,3 +69,439 @@ window.addEventListener('load', function() {
         document.body.style.opacity = '1';
     }, 100);
 });
+
+// Service worker: guarda o shell do app para abrir as listas sem conexão
+if ('serviceWorker' in navigator) {
+    window.addEventListener('load', function() {
+        navigator.serviceWorker.register('/sw.js').catch(() => {});
+    });
+}
+
+// ============================================================
+// Lista de compras offline (IndexedDB + fila de sincronização)
+// ============================================================
+// Inclusões, edições e remoções de itens são aplicadas na tela na hora,
+// gravadas numa fila no IndexedDB e enviadas em lote para o servidor
+// (/lista/<id>/itens/sincronizar) assim que houver conexão. Edições e
+// remoções levam a versão do item que o usuário viu (`base`); se o item
+// mudou no servidor, a operação volta como conflito e vale o valor atual.
+const BANCO_OFFLINE = 'zuna-offline';
+const MAX_OPERACOES_SYNC = 200;
+
+function abrirBancoOffline() {
+    return new Promise((resolve, reject) => {
+        const pedido = indexedDB.open(BANCO_OFFLINE, 1);
+        pedido.onupgradeneeded = () => {
+            const db = pedido.result;
+            db.createObjectStore('listas', { keyPath: 'id' });
+            const fila = db.createObjectStore('fila', { keyPath: 'chave', autoIncrement: true });
+            fila.createIndex('lista_id', 'lista_id');
+        };
+        pedido.onsuccess = () => resolve(pedido.result);
+        pedido.onerror = () => reject(pedido.error);
+    });
+}
+
+function transacaoOffline(db, store, modo, acao) {
+    return new Promise((resolve, reject) => {
+        const tx = db.transaction(store, modo);
+        const pedido = acao(tx.objectStore(store));
+        tx.oncomplete = () => resolve(pedido ? pedido.result : undefined);
+        tx.onerror = () => reject(tx.error);
+        tx.onabort = () => reject(tx.error);
+    });
+}
+
+function limparDadosOffline() {
+    const tarefas = [];
+    if (window.caches) {
+        tarefas.push(caches.delete('zuna-paginas'));
+    }
+    if (window.indexedDB) {
+        tarefas.push(new Promise((resolve) => {
+            const pedido = indexedDB.deleteDatabase(BANCO_OFFLINE);
+            pedido.onsuccess = pedido.onerror = pedido.onblocked = resolve;
+        }));
+    }
+    return Promise.all(tarefas);
+}
+
+function novoIdCliente() {
+    if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+    return Date.now().toString(36) + Math.random().toString(36).slice(2);
+}
+
+function camposItem(origem) {
+    return {
+        descricao: String(origem.descricao).trim(),
+        quantidade: parseInt(origem.quantidade, 10),
+        valor: Math.round(parseFloat(origem.valor) * 100) / 100
+    };
+}
+
+function moedaCentavos(centavos) {
+    return 'R$ ' + (centavos / 100).toFixed(2);
+}
+
+class ListaOffline {
+    constructor(elemento, db) {
+        this.db = db;
+        this.listaId = Number(elemento.dataset.listaId);
+        this.urlSync = elemento.dataset.syncUrl;
+        this.geradoEm = Number(elemento.dataset.geradoEm);
+        this.itens = JSON.parse(document.getElementById('dadosListaOffline').textContent);
+        this.fila = [];
+        this.emEnvio = new Set();
+        this.enviando = false;
+        this.timer = null;
+    }
+
+    async iniciar() {
+        // Sem conexão a página pode vir do cache do service worker, mais
+        // antiga que o último estado sincronizado guardado no IndexedDB.
+        const salvo = await transacaoOffline(this.db, 'listas', 'readonly', (s) => s.get(this.listaId));
+        const usarSalvo = salvo && salvo.gerado_em > this.geradoEm;
+        if (usarSalvo) {
+            this.itens = salvo.itens;
+            this.geradoEm = salvo.gerado_em;
+        } else {
+            await this.salvarLista();
+        }
+
+        this.fila = await transacaoOffline(this.db, 'fila', 'readonly',
+            (s) => s.index('lista_id').getAll(this.listaId));
+        this.ligarEventos();
+        if (usarSalvo || this.fila.length) this.renderizar();
+        if (this.fila.length) this.agendarEnvio(0);
+    }
+
+    salvarLista() {
+        return transacaoOffline(this.db, 'listas', 'readwrite', (s) => s.put({
+            id: this.listaId, itens: this.itens, gerado_em: this.geradoEm
+        }));
+    }
+
+    async gravarNaFila(op) {
+        op.chave = await transacaoOffline(this.db, 'fila', 'readwrite', (s) => s.put(op));
+        if (!this.fila.includes(op)) this.fila.push(op);
+    }
+
+    async removerDaFila(chaves) {
+        await transacaoOffline(this.db, 'fila', 'readwrite', (s) => {
+            chaves.forEach((chave) => s.delete(chave));
+        });
+        this.fila = this.fila.filter((op) => !chaves.includes(op.chave));
+    }
+
+    // Itens do servidor com as operações pendentes aplicadas por cima.
+    visao() {
+        const itens = this.itens.map((item) => Object.assign({}, item));
+        this.fila.forEach((op) => {
+            if (op.op === 'adicionar') {
+                itens.push(Object.assign({ id: null, cliente_id: op.cliente_id, pendente: true }, camposItem(op)));
+                return;
+            }
+            const indice = itens.findIndex((item) =>
+                op.id ? item.id === op.id : item.cliente_id === op.alvo);
+            if (indice < 0) return;
+            if (op.op === 'deletar') {
+                itens.splice(indice, 1);
+            } else {
+                Object.assign(itens[indice], camposItem(op), { pendente: true });
+            }
+        });
+        return itens;
+    }
+
+    async enfileirar(op) {
+        op.lista_id = this.listaId;
+        if (op.op !== 'adicionar') {
+            const livres = this.fila.filter((o) => !this.emEnvio.has(o.chave));
+
+            // Item que ainda não subiu: basta alterar (ou descartar) a inclusão.
+            const inclusao = !op.id && livres.find((o) => o.op === 'adicionar' && o.cliente_id === op.alvo);
+            if (inclusao) {
+                if (op.op === 'deletar') {
+                    await this.removerDaFila([inclusao.chave]);
+                } else {
+                    await this.gravarNaFila(Object.assign(inclusao, camposItem(op)));
+                }
+                return this.aposAlteracao();
+            }
+
+            const anterior = op.id && livres.find((o) => o.op === 'editar' && o.id === op.id);
+            if (anterior) {
+                op.base = anterior.base;
+                await this.removerDaFila([anterior.chave]);
+            } else if (op.id) {
+                const atual = this.itens.find((item) => item.id === op.id);
+                if (!atual) return this.aposAlteracao();
+                op.base = camposItem(atual);
+            }
+        }
+        await this.gravarNaFila(op);
+        return this.aposAlteracao();
+    }
+
+    aposAlteracao() {
+        this.renderizar();
+        this.agendarEnvio();
+    }
+
+    agendarEnvio(espera = 400) {
+        clearTimeout(this.timer);
+        if (!navigator.onLine) return;
+        this.timer = setTimeout(() => this.enviar(), espera);
+    }
+
+    async enviar() {
+        if (this.enviando) return;
+        // Edições de itens cuja inclusão ainda está a caminho esperam o id.
+        const lote = this.fila.filter((op) => op.op === 'adicionar' || op.id).slice(0, MAX_OPERACOES_SYNC);
+        if (!lote.length) return;
+
+        this.enviando = true;
+        this.emEnvio = new Set(lote.map((op) => op.chave));
+        this.atualizarStatus();
+        let continuar = false;
+        try {
+            const resposta = await fetch(this.urlSync, {
+                method: 'POST',
+                credentials: 'same-origin',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ operacoes: lote.map((op) => ({
+                    op: op.op, cliente_id: op.cliente_id, id: op.id, base: op.base,
+                    descricao: op.descricao, quantidade: op.quantidade, valor: op.valor
+                })) })
+            });
+            const tipo = resposta.headers.get('Content-Type') || '';
+            if (resposta.redirected || !tipo.includes('json')) {
+                mostrarFeedback('Sessao expirada: entre novamente para sincronizar a lista.', 'warning');
+            } else if (resposta.status === 409) {
+                await this.removerDaFila(this.fila.map((op) => op.chave));
+                mostrarFeedback('A lista foi concluida ou removida; alteracoes pendentes descartadas.', 'danger');
+                setTimeout(() => window.location.reload(), 1500);
+            } else if (resposta.status >= 500) {
+                setTimeout(() => this.agendarEnvio(0), 30000);
+            } else if (!resposta.ok) {
+                await this.removerDaFila(lote.map((op) => op.chave));
+                mostrarFeedback('Algumas alteracoes foram recusadas pelo servidor.', 'danger');
+            } else {
+                await this.processarResposta(lote, await resposta.json());
+                continuar = true;
+            }
+        } catch (erro) {
+            // Sem rede: a fila continua no IndexedDB e sobe no evento `online`.
+        } finally {
+            this.enviando = false;
+            this.emEnvio = new Set();
+            this.renderizar();
+        }
+        if (continuar && this.fila.some((op) => op.op === 'adicionar' || op.id)) this.agendarEnvio(0);
+    }
+
+    async processarResposta(lote, dados) {
+        const porCliente = new Map(dados.resultados.map((r) => [r.cliente_id, r]));
+        const novosIds = new Map();
+        const aplicados = new Set();
+        let conflitos = 0;
+        let invalidos = 0;
+        lote.forEach((op) => {
+            const resultado = porCliente.get(op.cliente_id);
+            if (!resultado) return;
+            if (resultado.status === 'conflito') conflitos++;
+            if (resultado.status === 'invalido') invalidos++;
+            if (resultado.status !== 'ok') return;
+            if (op.op === 'adicionar') novosIds.set(op.cliente_id, resultado.id);
+            aplicados.add(resultado.id);
+        });
+
+        await this.removerDaFila(lote.map((op) => op.chave));
+        this.itens = dados.itens;
+        this.geradoEm = dados.gerado_em;
+        await this.salvarLista();
+
+        // Operações feitas durante o envio passam a partir do estado novo.
+        const orfas = [];
+        for (const op of this.fila) {
+            if (op.op === 'adicionar') continue;
+            if (!op.id && novosIds.has(op.alvo)) op.id = novosIds.get(op.alvo);
+            if (!op.id) {
+                const aguardando = this.fila.some((o) => o.op === 'adicionar' && o.cliente_id === op.alvo);
+                if (!aguardando) orfas.push(op.chave);
+                continue;
+            }
+            const atual = this.itens.find((item) => item.id === op.id);
+            if (atual && (aplicados.has(op.id) || !op.base)) op.base = camposItem(atual);
+            await this.gravarNaFila(op);
+        }
+        if (orfas.length) await this.removerDaFila(orfas);
+
+        if (conflitos) {
+            mostrarFeedback(conflitos + ' alteracao(oes) nao aplicada(s): o item mudou em outro lugar. A lista foi atualizada.', 'warning');
+        }
+        if (invalidos) {
+            mostrarFeedback(invalidos + ' alteracao(oes) invalida(s) descartada(s).', 'danger');
+        }
+    }
+
+    linha(item) {
+        const centavos = Math.round(item.valor * 100);
+        const subtotal = centavos * item.quantidade;
+        const tr = document.createElement('tr');
+        tr.dataset.chave = item.id || item.cliente_id;
+        if (item.pendente) tr.classList.add('table-warning');
+        tr.innerHTML = `
+            <td class="text-center"><input type="checkbox" class="form-check-input item-checkbox" checked></td>
+            <td></td>
+            <td class="text-center"></td>
+            <td class="text-end"></td>
+            <td class="text-end"><strong></strong></td>
+            <td class="text-center">
+                <button type="button" class="btn btn-sm btn-outline-primary" data-bs-toggle="modal" data-bs-target="#modalEditarItem">
+                    <i class="bi bi-pencil"></i>
+                </button>
+                <form method="POST" action="" class="form-remover-item" style="display: inline;">
+                    <button type="submit" class="btn btn-sm btn-outline-danger" onclick="return confirm('Remover este item?')">
+                        <i class="bi bi-trash"></i>
+                    </button>
+                </form>
+            </td>`;
+
+        const celulas = tr.children;
+        const checkbox = celulas[0].firstElementChild;
+        checkbox.dataset.itemId = item.id || '';
+        checkbox.dataset.subtotal = (subtotal / 100).toFixed(2);
+        celulas[1].textContent = item.descricao;
+        celulas[2].textContent = item.quantidade;
+        celulas[3].textContent = moedaCentavos(centavos);
+        celulas[4].firstElementChild.textContent = moedaCentavos(subtotal);
+
+        Object.assign(celulas[5].querySelector('button').dataset, {
+            itemId: item.id || '',
+            clienteId: item.cliente_id || '',
+            descricao: item.descricao,
+            quantidade: item.quantidade,
+            valor: (centavos / 100).toFixed(2)
+        });
+        const form = celulas[5].querySelector('form');
+        form.dataset.itemId = item.id || '';
+        form.dataset.clienteId = item.cliente_id || '';
+        return tr;
+    }
+
+    renderizar() {
+        const corpo = document.getElementById('corpoItens');
+        const desmarcados = new Set(Array.from(corpo.querySelectorAll('.item-checkbox'))
+            .filter((c) => !c.checked)
+            .map((c) => c.closest('tr').dataset.chave));
+
+        const itens = this.visao();
+        corpo.replaceChildren(...itens.map((item) => {
+            const tr = this.linha(item);
+            if (desmarcados.has(String(tr.dataset.chave))) tr.querySelector('.item-checkbox').checked = false;
+            return tr;
+        }));
+
+        const total = itens.reduce((soma, item) => soma + Math.round(item.valor * 100) * item.quantidade, 0);
+        document.querySelectorAll('[data-lista-total]').forEach((el) => { el.textContent = (total / 100).toFixed(2); });
+        document.querySelectorAll('[data-lista-qtd]').forEach((el) => { el.textContent = itens.length; });
+        document.getElementById('tabelaItens').classList.toggle('d-none', !itens.length);
+        document.getElementById('semItens').classList.toggle('d-none', itens.length > 0);
+        const btnPagar = document.getElementById('btnPagarLista');
+        if (btnPagar) btnPagar.classList.toggle('d-none', !itens.length);
+
+        this.atualizarStatus();
+        document.dispatchEvent(new Event('lista:atualizada'));
+    }
+
+    atualizarStatus() {
+        const status = document.getElementById('statusSincronizacao');
+        if (!status) return;
+        const pendentes = this.fila.length;
+        status.classList.toggle('d-none', !pendentes);
+        if (!pendentes) return;
+        status.textContent = this.enviando
+            ? 'Sincronizando...'
+            : pendentes + ' alteracao(oes) pendente(s)' + (navigator.onLine ? '' : ' - offline');
+    }
+
+    ligarEventos() {
+        const fecharModal = (form) => {
+            const modal = form.closest('.modal');
+            if (modal && window.bootstrap) bootstrap.Modal.getOrCreateInstance(modal).hide();
+        };
+
+        const formAdicionar = document.getElementById('formAdicionarItem');
+        formAdicionar.addEventListener('submit', (event) => {
+            event.preventDefault();
+            const campos = camposItem(Object.fromEntries(new FormData(formAdicionar)));
+            if (!campos.descricao) return;
+            this.enfileirar(Object.assign({ op: 'adicionar', cliente_id: novoIdCliente() }, campos));
+            formAdicionar.reset();
+            fecharModal(formAdicionar);
+        });
+
+        const formEditar = document.getElementById('formEditarItem');
+        formEditar.addEventListener('submit', (event) => {
+            event.preventDefault();
+            const dados = Object.fromEntries(new FormData(formEditar));
+            const campos = camposItem(dados);
+            if (!campos.descricao) return;
+            this.enfileirar(Object.assign({
+                op: 'editar',
+                cliente_id: novoIdCliente(),
+                id: Number(dados.item_id) || null,
+                alvo: dados.cliente_id || null
+            }, campos));
+            fecharModal(formEditar);
+        });
+
+        document.addEventListener('submit', (event) => {
+            const form = event.target.closest('.form-remover-item');
+            if (!form) return;
+            event.preventDefault();
+            this.enfileirar({
+                op: 'deletar',
+                cliente_id: novoIdCliente(),
+                id: Number(form.dataset.itemId) || null,
+                alvo: form.dataset.clienteId || null
+            });
+        });
+
+        // O pagamento usa os ids do servidor: sincroniza a fila antes.
+        const formPagar = document.getElementById('formPagarLista');
+        if (formPagar) {
+            formPagar.addEventListener('submit', async (event) => {
+                if (!this.fila.length) return;
+                event.preventDefault();
+                await this.enviar();
+                if (this.fila.length) {
+                    mostrarFeedback('Sincronize as alteracoes da lista antes de pagar.', 'warning');
+                    return;
+                }
+                document.dispatchEvent(new Event('lista:atualizada'));
+                formPagar.submit();
+            });
+        }
+
+        window.addEventListener('online', () => this.agendarEnvio(0));
+        window.addEventListener('offline', () => this.atualizarStatus());
+    }
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    const elemento = document.getElementById('listaOffline');
+    if (!elemento || !window.indexedDB) return;
+    abrirBancoOffline()
+        .then((db) => new ListaOffline(elemento, db).iniciar())
+        .catch(() => {});
+});
+
+// Ao sair, remove páginas e dados da lista guardados neste navegador.
+document.addEventListener('click', function(event) {
+    const link = event.target.closest('a[data-limpar-offline]');
+    if (!link) return;
+    event.preventDefault();
+    limparDadosOffline().finally(() => { window.location.href = link.href; });
+});
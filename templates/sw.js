@@ -0,0 +1,82 @@
+// Service worker do Zuna (gerado por /sw.js)
+const CACHE_SHELL = 'zuna-shell-{{ versao }}';
+const CACHE_PAGINAS = 'zuna-paginas';
+const ARQUIVOS_SHELL = {{ arquivos|tojson }};
+const PAGINA_INICIAL = {{ pagina_inicial|tojson }};
+
+self.addEventListener('install', (event) => {
+    event.waitUntil(
+        caches.open(CACHE_SHELL)
+            .then((cache) => cache.addAll(ARQUIVOS_SHELL))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', (event) => {
+    event.waitUntil(
+        caches.keys()
+            .then((nomes) => Promise.all(
+                nomes.filter((nome) => nome.startsWith('zuna-shell-') && nome !== CACHE_SHELL)
+                    .map((nome) => caches.delete(nome))
+            ))
+            .then(() => self.clients.claim())
+    );
+});
+
+// Assets versionados e CDN não mudam: cache primeiro.
+function cachePrimeiro(request) {
+    return caches.match(request).then((cacheada) => cacheada || fetch(request).then((resposta) => {
+        if (resposta.ok || resposta.type === 'opaque') {
+            const copia = resposta.clone();
+            caches.open(CACHE_SHELL).then((cache) => cache.put(request, copia));
+        }
+        return resposta;
+    }));
+}
+
+// /static e /img sem build: responde do cache e atualiza em segundo plano.
+function cacheEAtualiza(request) {
+    return caches.open(CACHE_SHELL).then((cache) => cache.match(request).then((cacheada) => {
+        const rede = fetch(request).then((resposta) => {
+            if (resposta.ok) cache.put(request, resposta.clone());
+            return resposta;
+        });
+        return cacheada || rede;
+    }));
+}
+
+// Páginas: rede primeiro; sem conexão, a última versão vista (ou as listas).
+function redePrimeiro(request) {
+    return fetch(request)
+        .then((resposta) => {
+            if (resposta.ok && !resposta.redirected) {
+                const copia = resposta.clone();
+                caches.open(CACHE_PAGINAS).then((cache) => cache.put(request, copia));
+            }
+            return resposta;
+        })
+        .catch(() => caches.open(CACHE_PAGINAS).then((cache) =>
+            cache.match(request).then((cacheada) => cacheada || cache.match(PAGINA_INICIAL))
+        ).then((cacheada) => cacheada || new Response(
+            '<h1>Sem conexao</h1><p>Abra esta pagina novamente quando estiver online.</p>',
+            { status: 503, headers: { 'Content-Type': 'text/html; charset=utf-8' } }
+        )));
+}
+
+self.addEventListener('fetch', (event) => {
+    const request = event.request;
+    if (request.method !== 'GET') return;
+
+    const url = new URL(request.url);
+    if (url.origin !== self.location.origin) {
+        if (url.hostname === 'cdn.jsdelivr.net') event.respondWith(cachePrimeiro(request));
+        return;
+    }
+    if (url.pathname.startsWith('/assets/')) {
+        event.respondWith(cachePrimeiro(request));
+    } else if (url.pathname.startsWith('/static/') || url.pathname.startsWith('/img/')) {
+        event.respondWith(cacheEAtualiza(request));
+    } else if (request.mode === 'navigate') {
+        event.respondWith(redePrimeiro(request));
+    }
+});
@@ -0,0 +1,161 @@
+import itertools
+import os
+import sys
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+
+class _Resposta:
+    def __init__(self, data):
+        self.data = data
+
+
+class _Consulta:
+    """Subconjunto do query builder do supabase-py sobre listas de dicts."""
+
+    def __init__(self, banco, tabela):
+        self.banco, self.tabela = banco, tabela
+        self.filtros, self.ordem = [], []
+        self.operacao, self.dados = 'select', None
+        self.limite, self.unico = None, False
+
+    def select(self, *args, **kwargs):
+        return self
+
+    def insert(self, dados):
+        self.operacao, self.dados = 'insert', dados
+        return self
+
+    def update(self, dados):
+        self.operacao, self.dados = 'update', dados
+        return self
+
+    def upsert(self, dados, on_conflict=None, **kwargs):
+        self.operacao, self.dados = 'upsert', dados
+        self.chave = on_conflict or self.banco.chaves.get(self.tabela, 'id')
+        return self
+
+    def delete(self):
+        self.operacao = 'delete'
+        return self
+
+    def _filtro(self, campo, teste):
+        self.filtros.append(lambda linha: teste(linha.get(campo)))
+        return self
+
+    def eq(self, campo, valor):
+        return self._filtro(campo, lambda v: v == valor)
+
+    def neq(self, campo, valor):
+        return self._filtro(campo, lambda v: v != valor)
+
+    def gt(self, campo, valor):
+        return self._filtro(campo, lambda v: v is not None and v > valor)
+
+    def gte(self, campo, valor):
+        return self._filtro(campo, lambda v: v is not None and v >= valor)
+
+    def lt(self, campo, valor):
+        return self._filtro(campo, lambda v: v is not None and v < valor)
+
+    def lte(self, campo, valor):
+        return self._filtro(campo, lambda v: v is not None and v <= valor)
+
+    def in_(self, campo, valores):
+        valores = list(valores)
+        return self._filtro(campo, lambda v: v in valores)
+
+    def order(self, campo, desc=False):
+        self.ordem.append((campo, desc))
+        return self
+
+    def limit(self, n):
+        self.limite = n
+        return self
+
+    def single(self):
+        self.unico = True
+        return self
+
+    maybe_single = single
+
+    def execute(self):
+        linhas = self.banco.tabelas.setdefault(self.tabela, [])
+        if self.operacao in ('insert', 'upsert'):
+            novas = self.dados if isinstance(self.dados, list) else [self.dados]
+            for nova in novas:
+                chave = getattr(self, 'chave', 'id')
+                existente = [l for l in linhas if chave in nova and l.get(chave) == nova[chave]]
+                if self.operacao == 'upsert' and existente:
+                    existente[0].update(nova)
+                else:
+                    nova = dict(nova)
+                    nova.setdefault('id', next(self.banco.ids))
+                    linhas.append(nova)
+            return _Resposta([dict(n) for n in novas])
+        achadas = [l for l in linhas if all(f(l) for f in self.filtros)]
+        if self.operacao == 'update':
+            for linha in achadas:
+                linha.update(self.dados)
+            return _Resposta([dict(l) for l in achadas])
+        if self.operacao == 'delete':
+            for linha in achadas:
+                linhas.remove(linha)
+            return _Resposta(achadas)
+        for campo, desc in reversed(self.ordem):
+            achadas.sort(key=lambda l: (l.get(campo) is None, l.get(campo)), reverse=desc)
+        if self.limite is not None:
+            achadas = achadas[:self.limite]
+        if self.unico:
+            return _Resposta(dict(achadas[0]) if achadas else None)
+        return _Resposta([dict(l) for l in achadas])
+
+
+class _Rpc:
+    def __init__(self, banco, funcao, params):
+        self.banco, self.funcao, self.params = banco, funcao, params
+
+    def execute(self):
+        self.banco.rpcs.append((self.funcao, self.params))
+        tratador = self.banco.funcoes.get(self.funcao)
+        return _Resposta(tratador(self.params) if tratador else None)
+
+
+class SupabaseFalso:
+    """Cliente em memória: `tabelas[nome]` são listas de dicts e
+    `funcoes[nome]` simula as RPCs (as chamadas ficam em `rpcs`).
+    `chaves[nome]` é a chave primária usada no upsert (padrão `id`)."""
+
+    def __init__(self):
+        self.tabelas, self.funcoes, self.rpcs, self.chaves = {}, {}, [], {}
+        self.ids = itertools.count(1000)
+
+    def table(self, nome):
+        return _Consulta(self, nome)
+
+    def rpc(self, funcao, params=None):
+        return _Rpc(self, funcao, params or {})
+
+
+@pytest.fixture
+def banco(monkeypatch):
+    import app
+    falso = SupabaseFalso()
+    falso.tabelas[app.TABLE_USUARIOS] = [{'id': 1, 'nome': 'Ana', 'versao_dados': 1}]
+    monkeypatch.setattr(app, 'get_supabase', lambda: falso)
+    monkeypatch.setattr(app, 'cache_local', app.CacheLocal())
+    return falso
+
+
+@pytest.fixture
+def cliente(banco):
+    import app
+    cliente = app.app.test_client()
+    with cliente.session_transaction() as sessao:
+        sessao['user_id'] = 1
+        sessao['user_nome'] = 'Ana'
+    return cliente
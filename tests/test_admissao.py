@@ -0,0 +1,41 @@
+"""Controle de admissão compartilhado entre workers (RATE_LIMIT_STORE)."""
+import pytest
+
+import app
+
+
+@pytest.fixture
+def limitador(tmp_path, monkeypatch):
+    caminho = str(tmp_path / 'limites.db')
+    monkeypatch.setattr(app, '_limitador', app.LimitadorSQLite(caminho))
+    # Outro worker do mesmo servidor: conexão própria, mesmo arquivo.
+    return app.LimitadorSQLite(caminho)
+
+
+def test_vagas_ocupadas_por_outros_workers_geram_429(limitador):
+    for _ in range(app._OCR_VAGAS):
+        assert limitador.ocupar('ocr:admissao', app._OCR_VAGAS, 60) is not None
+
+    cliente = app.app.test_client()
+    with cliente.session_transaction() as sessao:
+        sessao['user_id'] = 1
+    resposta = cliente.post('/lista/1/importar-nota', headers={'Accept': 'application/json'})
+
+    assert resposta.status_code == 429
+    assert resposta.headers['Retry-After'] == '10'
+    assert 'ocupado' in resposta.get_json()['erro']
+
+
+def test_vaga_liberada_e_expirada_voltam_a_admitir(limitador):
+    rota = app.controlar_admissao('teste', vagas=2, espera_sugerida=5, validade=60)(lambda: 'ok')
+    ficha = limitador.ocupar('teste:admissao', 2, 60)
+    limitador.ocupar('teste:admissao', 2, -1)  # worker que morreu com a vaga
+
+    with app.app.test_request_context():
+        assert rota() == 'ok'
+        outra = limitador.ocupar('teste:admissao', 2, 60)
+        assert rota().status_code == 429
+        limitador.liberar('teste:admissao', outra)
+        assert rota() == 'ok'
+    limitador.liberar('teste:admissao', ficha)
+    assert limitador.ocupar('teste:admissao', 2, 60) is not None
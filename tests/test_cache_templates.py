@@ -0,0 +1,22 @@
+"""Cache de bytecode dos templates."""
+import os
+
+import app
+
+
+def test_diretorio_criado_na_primeira_gravacao(tmp_path, monkeypatch):
+    destino = tmp_path / 'jinja-cache'
+    monkeypatch.setattr(app.app.jinja_env, 'bytecode_cache', app.BytecodeCacheApp(str(destino)))
+    monkeypatch.setattr(app.app.jinja_env, 'cache', {})
+    assert not destino.exists()
+
+    app.app.jinja_env.get_template('sw.js')
+
+    assert os.listdir(destino)
+
+
+def test_versao_da_extensao_entra_na_chave(monkeypatch):
+    cache = app.BytecodeCacheApp('/nao/usado')
+    antes = cache.get_cache_key('index.html')
+    monkeypatch.setattr(app.FragmentCacheExtension, 'versao', app.FragmentCacheExtension.versao + 1)
+    assert cache.get_cache_key('index.html') != antes
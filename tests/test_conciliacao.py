@@ -0,0 +1,132 @@
+"""Conciliação incremental de saldos (conciliar-saldos)."""
+import pytest
+from click.testing import CliRunner
+
+import app
+
+
+def _delta(t):
+    return app.centavos(t['valor']) * (1 if t['tipo'] == 'entrada' else -1)
+
+
+@pytest.fixture
+def razao(banco):
+    """Contas, transações e as RPCs de conciliação em memória (como no setup.sql)."""
+    banco.chaves[app.TABLE_CONCILIACAO] = 'conta_id'
+    t = banco.tabelas
+    t[app.TABLE_CONTAS] = [{'id': 1, 'user_id': 1, 'saldo': '110.00'}]
+    t[app.TABLE_TRANSACOES] = [
+        {'id': 10, 'conta_id': 1, 'tipo': 'entrada', 'valor': '100.00'},
+        {'id': 12, 'conta_id': 1, 'tipo': 'entrada', 'valor': '10.00'},
+    ]
+    t[app.TABLE_CONCILIACAO] = [
+        {'conta_id': 1, 'ultima_transacao_id': 10, 'saldo_verificado': '100.00', 'divergencia': 0},
+    ]
+    t[app.TABLE_CONCILIACAO_CURSOR] = [{'id': 1, 'ultima_transacao_id': 10}]
+
+    def iniciar(params):
+        cursor = t[app.TABLE_CONCILIACAO_CURSOR][0]['ultima_transacao_id']
+        com_ponto = {p['conta_id'] for p in t[app.TABLE_CONCILIACAO]}
+        novas = [c for c in t[app.TABLE_CONTAS] if c['id'] not in com_ponto]
+        for conta in novas:
+            depois = sum(_delta(x) for x in t[app.TABLE_TRANSACOES]
+                         if x['conta_id'] == conta['id'] and x['id'] > cursor)
+            t[app.TABLE_CONCILIACAO].append({
+                'conta_id': conta['id'], 'ultima_transacao_id': cursor, 'divergencia': 0,
+                'saldo_verificado': app.reais(app.centavos(conta['saldo']) - depois),
+            })
+        return len(novas)
+
+    def ajustar(params):
+        for a in params['p_ajustes']:
+            conta = next(c for c in t[app.TABLE_CONTAS] if c['id'] == a['conta_id'])
+            conta['saldo'] = app.reais(app.centavos(conta['saldo']) + app.centavos(a['delta']))
+
+    banco.funcoes['p01cf_conciliacao_iniciar'] = iniciar
+    banco.funcoes['p01cf_ajustar_saldos'] = ajustar
+    return banco
+
+
+def _conciliar(*args):
+    return CliRunner().invoke(app.app.cli, ['conciliar-saldos', '--espera', '0', *args])
+
+
+def _cursor(banco):
+    return banco.tabelas[app.TABLE_CONCILIACAO_CURSOR][0]['ultima_transacao_id']
+
+
+def _ponto(banco, conta_id):
+    return next(p for p in banco.tabelas[app.TABLE_CONCILIACAO] if p['conta_id'] == conta_id)
+
+
+def test_execucao_interrompida_retoma_do_cursor_sem_falsa_divergencia(razao):
+    # Conta nova com transação entre o cursor e o topo.
+    razao.tabelas[app.TABLE_CONTAS].append({'id': 2, 'user_id': 1, 'saldo': '50.00'})
+    razao.tabelas[app.TABLE_TRANSACOES].insert(1, {'id': 11, 'conta_id': 2, 'tipo': 'entrada', 'valor': '50.00'})
+
+    parcial = _conciliar('--lote', '1', '--max-lotes', '1')
+    assert parcial.exit_code == 0, parcial.output
+    assert 'Execucao parcial' in parcial.output
+    assert _cursor(razao) == 11
+    assert _ponto(razao, 2)['ultima_transacao_id'] == 11
+
+    resto = _conciliar('--lote', '1')
+    assert resto.exit_code == 0, resto.output
+    assert _cursor(razao) == 12
+    assert app.centavos(_ponto(razao, 1)['saldo_verificado']) == 11000
+    assert app.centavos(_ponto(razao, 2)['saldo_verificado']) == 5000
+
+
+def test_centavos_exatos_sem_ruido_de_float(razao):
+    razao.tabelas[app.TABLE_CONTAS][0]['saldo'] = 110.3
+    razao.tabelas[app.TABLE_TRANSACOES] += [
+        {'id': 13, 'conta_id': 1, 'tipo': 'entrada', 'valor': 0.1},
+        {'id': 14, 'conta_id': 1, 'tipo': 'entrada', 'valor': 0.2},
+    ]
+    resultado = _conciliar()
+    assert resultado.exit_code == 0, resultado.output
+    assert '0 com divergencia' in resultado.output
+
+
+def test_divergencia_relatada_e_depois_corrigida(razao):
+    razao.tabelas[app.TABLE_CONTAS][0]['saldo'] = '115.00'
+
+    relatorio = _conciliar()
+    assert relatorio.exit_code == 1
+    assert 'divergencia R$ 5,00' in relatorio.output
+    assert app.centavos(_ponto(razao, 1)['divergencia']) == 500
+
+    # Sem transações novas: a divergência registrada volta a ser conferida.
+    correcao = _conciliar('--corrigir')
+    assert correcao.exit_code == 0, correcao.output
+    assert razao.rpcs[-1] == ('p01cf_ajustar_saldos', {'p_ajustes': [{'conta_id': 1, 'delta': -5.0}]})
+    assert app.centavos(razao.tabelas[app.TABLE_CONTAS][0]['saldo']) == 11000
+    assert _ponto(razao, 1)['divergencia'] == 0
+
+
+def test_transacao_gravada_durante_a_execucao_nao_e_divergencia(razao, monkeypatch):
+    def chega_transacao(segundos):
+        if not any(x['id'] == 13 for x in razao.tabelas[app.TABLE_TRANSACOES]):
+            razao.tabelas[app.TABLE_TRANSACOES].append(
+                {'id': 13, 'conta_id': 1, 'tipo': 'saida', 'valor': '1.00'})
+            razao.tabelas[app.TABLE_CONTAS][0]['saldo'] = '109.00'
+    monkeypatch.setattr(app.time, 'sleep', chega_transacao)
+
+    resultado = _conciliar()
+    assert resultado.exit_code == 0, resultado.output
+    assert _cursor(razao) == 12  # a 13 fica para a próxima execução
+
+
+def test_saldo_mudou_entre_as_leituras_nao_e_divergencia(razao, monkeypatch):
+    razao.tabelas[app.TABLE_CONTAS][0]['saldo'] = '115.00'
+    chamadas = []
+
+    def escrita_concorrente(segundos):
+        chamadas.append(segundos)
+        if len(chamadas) == 2:  # espera antes da segunda leitura
+            razao.tabelas[app.TABLE_CONTAS][0]['saldo'] = '110.00'
+    monkeypatch.setattr(app.time, 'sleep', escrita_concorrente)
+
+    resultado = _conciliar()
+    assert resultado.exit_code == 0, resultado.output
+    assert len(chamadas) == 2
@@ -0,0 +1,71 @@
+"""Aritmética de dinheiro em centavos inteiros."""
+import random
+import timeit
+from decimal import Decimal
+
+import pytest
+
+from app import _formatar_centavos, centavos, formatar_moeda, reais
+
+_ALEATORIO = random.Random(38)
+_CENTAVOS = [_ALEATORIO.randint(-10 ** 12, 10 ** 12) for _ in range(2000)] + [0, 1, -1, 99, -99, 100, -100]
+
+
+@pytest.mark.parametrize('valor, esperado', [
+    ('0.005', 1),
+    ('1.005', 101),
+    ('2.675', 268),
+    ('-0.005', -1),
+    ('-1.005', -101),
+    ('-2.675', -268),
+    ('0.004', 0),
+    ('-0.004', 0),
+    (1.005, 101),
+    (-1.005, -101),
+    (0.1 + 0.2, 30),
+    (12, 1200),
+    ('-7', -700),
+    (None, 0),
+    ('', 0),
+])
+def test_arredondamento_meio_para_longe_do_zero(valor, esperado):
+    assert centavos(valor) == esperado
+
+
+def test_valor_invalido():
+    with pytest.raises(ValueError):
+        centavos('doze reais')
+
+
+def test_ida_e_volta_a_partir_dos_reais():
+    for c in _CENTAVOS:
+        texto = str(Decimal(c) / 100)
+        assert reais(centavos(texto)) == float(texto)
+        assert reais(centavos(float(texto))) == float(texto)
+
+
+def test_ida_e_volta_a_partir_dos_centavos():
+    for c in _CENTAVOS:
+        assert centavos(reais(c)) == c
+
+
+def test_formatacao_bate_com_decimal():
+    for c in _CENTAVOS:
+        esperado = f'{Decimal(c) / 100:.2f}'
+        assert _formatar_centavos(c) == esperado
+        assert _formatar_centavos(c, ',') == esperado.replace('.', ',')
+    assert _formatar_centavos(-5) == '-0.05'
+    assert formatar_moeda(-123456) == 'R$ -1234,56'
+
+
+def test_desempenho():
+    """Referência grosseira: parse + formatação de 100 mil valores bem abaixo de 1 s."""
+    valores = [str(Decimal(c) / 100) for c in _CENTAVOS[:1000]]
+
+    def rodada():
+        for v in valores:
+            _formatar_centavos.__wrapped__(centavos(v))
+
+    segundos = min(timeit.repeat(rodada, number=100, repeat=3))
+    print(f'\ncentavos + _formatar_centavos: {segundos / 100_000 * 1e6:.2f} us/valor')
+    assert segundos < 2.0
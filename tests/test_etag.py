@@ -0,0 +1,74 @@
+"""ETag por usuário (etag_por_usuario) e versão de dados (altera_dados)."""
+import pytest
+from flask import session
+
+import app
+
+
+@pytest.fixture
+def painel(banco):
+    banco.tabelas[app.TABLE_CONTAS] = [
+        {'id': 1, 'user_id': 1, 'nome': 'Corrente', 'banco': 'X', 'categoria': 'Banco',
+         'saldo': '10.00', 'cor': '#000', 'arquivada': False},
+    ]
+    return banco
+
+
+def _versao(banco):
+    return banco.tabelas[app.TABLE_USUARIOS][0]['versao_dados']
+
+
+def test_if_none_match_igual_responde_304(cliente, painel):
+    primeira = cliente.get('/')
+    assert primeira.status_code == 200
+    etag = primeira.headers['ETag']
+    assert 'private' in primeira.headers['Cache-Control']
+
+    segunda = cliente.get('/', headers={'If-None-Match': etag})
+    assert segunda.status_code == 304
+    assert segunda.headers['ETag'] == etag
+    assert segunda.data == b''
+
+
+def test_etag_muda_com_a_versao_de_dados(cliente, painel):
+    etag = cliente.get('/').headers['ETag']
+    painel.tabelas[app.TABLE_USUARIOS][0]['versao_dados'] = 2
+
+    resposta = cliente.get('/', headers={'If-None-Match': etag})
+
+    assert resposta.status_code == 200
+    assert resposta.headers['ETag'] != etag
+
+
+def test_sem_etag_com_mensagem_flash_pendente(cliente, painel):
+    etag = cliente.get('/').headers['ETag']
+    with cliente.session_transaction() as sessao:
+        sessao['_flashes'] = [('success', 'Conta criada!')]
+
+    resposta = cliente.get('/', headers={'If-None-Match': etag})
+
+    assert resposta.status_code == 200
+    assert 'ETag' not in resposta.headers
+    assert 'Conta criada!' in resposta.get_data(as_text=True)
+
+
+def _rodar(banco, view):
+    with app.app.test_request_context(method='POST'):
+        session['user_id'] = 1
+        return app.altera_dados(view)()
+
+
+def test_altera_dados_avanca_a_versao_no_sucesso(banco):
+    _rodar(banco, lambda: 'ok')
+    assert _versao(banco) > 1
+
+
+def test_altera_dados_mantem_a_versao_em_erro(banco):
+    def falha():
+        raise RuntimeError('banco fora do ar')
+    with pytest.raises(RuntimeError):
+        _rodar(banco, falha)
+    assert _versao(banco) == 1
+
+    _rodar(banco, lambda: ({'erro': 'invalido'}, 400))
+    assert _versao(banco) == 1
@@ -0,0 +1,85 @@
+"""Séries dos gráficos: redução LTTB e as rotas /graficos/*."""
+import random
+from datetime import date, timedelta
+
+import pytest
+
+import app
+
+
+def test_lttb_invariantes_em_series_aleatorias():
+    aleatorio = random.Random(39)
+    for _ in range(300):
+        n = aleatorio.randint(0, 400)
+        pontos = [(x, aleatorio.uniform(-1e6, 1e6)) for x in sorted(aleatorio.sample(range(10 ** 6), n))]
+        limite = aleatorio.randint(0, 450)
+
+        reduzidos = app.reduzir_lttb(pontos, limite)
+
+        if limite < 3 or limite >= n:
+            assert reduzidos == pontos
+            continue
+        assert len(reduzidos) == limite
+        assert reduzidos[0] == pontos[0] and reduzidos[-1] == pontos[-1]
+        xs = [x for x, _ in reduzidos]
+        assert xs == sorted(set(xs))
+        assert set(reduzidos) <= set(pontos)
+
+
+def test_lttb_preserva_pico():
+    pontos = [(x, 0.0) for x in range(200)]
+    pontos[137] = (137, 500.0)
+    assert (137, 500.0) in app.reduzir_lttb(pontos, 20)
+
+
+@pytest.fixture
+def historico(banco):
+    inicio = date(2020, 1, 1)
+    banco.funcoes['p01cf_serie_saldo'] = lambda params: [
+        {'dia': (inicio + timedelta(days=d)).isoformat(), 'saldo': f'{d}.50'} for d in range(3000)
+    ]
+    banco.funcoes['p01cf_serie_gastos'] = lambda params: [
+        {'dia': (inicio + timedelta(days=d)).isoformat(), 'categoria': 'Mercado', 'total': '10.00'}
+        for d in range(50)
+    ]
+    return banco
+
+
+@pytest.mark.parametrize('pontos, esperado', [
+    (None, app._GRAFICO_PONTOS_PADRAO),
+    ('50', 50),
+    ('1', 3),
+    ('-10', 3),
+    ('999999', app._GRAFICO_PONTOS_MAX),
+    ('abc', app._GRAFICO_PONTOS_PADRAO),
+])
+def test_pontos_limitados(cliente, historico, pontos, esperado):
+    url = '/graficos/saldo' + (f'?pontos={pontos}' if pontos else '')
+    dados = cliente.get(url).get_json()
+    assert dados['total_pontos'] == 3000
+    assert len(dados['pontos']) == esperado
+    assert dados['pontos'][0] == {'data': '2020-01-01', 'valor': 0.5}
+
+
+def test_serie_em_cache_por_versao_de_dados(cliente, historico):
+    cliente.get('/graficos/saldo')
+    cliente.get('/graficos/saldo?pontos=60')
+    assert [f for f, _ in historico.rpcs] == ['p01cf_serie_saldo']
+
+    historico.tabelas[app.TABLE_USUARIOS][0]['versao_dados'] = 2
+    cliente.get('/graficos/saldo')
+    assert len(historico.rpcs) == 2
+
+
+@pytest.mark.parametrize('periodo', ['ano', 'day', ''])
+def test_periodo_invalido(cliente, historico, periodo):
+    resposta = cliente.get(f'/graficos/gastos?periodo={periodo}')
+    assert resposta.status_code == 400
+    assert historico.rpcs == []
+
+
+def test_periodo_traduzido_para_o_banco(cliente, historico):
+    dados = cliente.get('/graficos/gastos?periodo=mes&pontos=10').get_json()
+    assert historico.rpcs == [('p01cf_serie_gastos', {'p_user_id': 1, 'p_periodo': 'month'})]
+    assert dados['periodo'] == 'mes'
+    assert len(dados['series']['Mercado']) == 10
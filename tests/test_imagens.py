@@ -0,0 +1,56 @@
+"""Variantes de /img e poda do cache."""
+import os
+import time
+
+import pytest
+from PIL import Image
+
+import app
+
+
+@pytest.fixture
+def pastas(tmp_path, monkeypatch):
+    origem, cache = tmp_path / 'img', tmp_path / 'cache'
+    origem.mkdir()
+    Image.new('RGB', (200, 100), 'red').save(origem / 'foto.png')
+    (origem / 'quebrada.png').write_bytes(b'nao e imagem')
+    monkeypatch.setattr(app, '_IMG_DIR', str(origem))
+    monkeypatch.setattr(app, '_IMG_CACHE_DIR', str(cache))
+    return origem, cache
+
+
+def test_variante_gerada(pastas):
+    resposta = app.app.test_client().get('/img/foto.png?w=64&fmt=png')
+    assert resposta.status_code == 200
+    assert resposta.mimetype == 'image/png'
+
+
+def test_arquivo_que_nao_e_imagem_da_415(pastas):
+    assert app.app.test_client().get('/img/quebrada.png?w=64').status_code == 415
+
+
+def test_erro_de_disco_nao_vira_415(pastas, monkeypatch):
+    def falha(*args, **kwargs):
+        raise PermissionError('sem permissao')
+    monkeypatch.setattr(app.tempfile, 'mkstemp', falha)
+    app.app.testing = True
+    try:
+        with pytest.raises(PermissionError):
+            app.app.test_client().get('/img/foto.png?w=64&fmt=png')
+    finally:
+        app.app.testing = False
+
+
+def test_poda_preserva_temporarios_e_recentes(pastas, monkeypatch):
+    _, cache = pastas
+    cache.mkdir()
+    antigo = time.time() - 3600
+    for nome in ('a.webp', 'b.webp', 'escrevendo.tmp', 'nova.webp'):
+        (cache / nome).write_bytes(b'x' * 100)
+    for nome in ('a.webp', 'b.webp', 'escrevendo.tmp'):
+        os.utime(cache / nome, (antigo, antigo))
+    monkeypatch.setattr(app, '_IMG_CACHE_MAX_BYTES', 150)
+
+    app._podar_cache_imagens()
+
+    assert sorted(os.listdir(cache)) == ['escrevendo.tmp', 'nova.webp']
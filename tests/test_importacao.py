@@ -0,0 +1,41 @@
+"""Orçamento de tempo de importação do app (cold start dos workers)."""
+import os
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Teto generoso para máquinas lentas de CI; ajuste com IMPORT_BUDGET_MS.
+ORCAMENTO_MS = int(os.getenv('IMPORT_BUDGET_MS', '1500'))
+
+
+def _importtime():
+    env = dict(os.environ)
+    # PRELOAD_APP=1 aquece o cliente de propósito; o teste mede o caso normal.
+    env.pop('PRELOAD_APP', None)
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app'],
+        cwd=RAIZ, env=env, capture_output=True, text=True, timeout=120
+    )
+    assert proc.returncode == 0, proc.stderr
+    modulos = {}
+    for linha in proc.stderr.splitlines():
+        if not linha.startswith('import time:') or '|' not in linha:
+            continue
+        _, cumulativo, nome = linha[len('import time:'):].split('|')
+        if cumulativo.strip().isdigit():
+            modulos[nome.strip()] = int(cumulativo)
+    return modulos
+
+
+def test_importacao_dentro_do_orcamento():
+    modulos = _importtime()
+    assert 'app' in modulos
+    assert modulos['app'] / 1000 < ORCAMENTO_MS, (
+        f"import app levou {modulos['app'] / 1000:.0f} ms (orcamento {ORCAMENTO_MS} ms)")
+
+
+def test_importacao_nao_carrega_supabase():
+    modulos = _importtime()
+    carregados = sorted(m for m in modulos if m.split('.')[0] in ('supabase', 'postgrest', 'gotrue'))
+    assert not carregados, carregados
@@ -0,0 +1,24 @@
+"""Inclusão de itens em lote a partir de texto colado."""
+import pytest
+
+from app import _extrair_itens_em_lote
+
+
+@pytest.mark.parametrize('linha, esperado', [
+    ('3x Leite 4,50', {'descricao': 'Leite', 'quantidade': 3, 'valor': 4.5}),
+    ('2 x Sabonete 3,00', {'descricao': 'Sabonete', 'quantidade': 2, 'valor': 3.0}),
+    ('2x Arroz', {'descricao': 'Arroz', 'quantidade': 2, 'valor': 0.0}),
+    ('Cafe 2 x 12,90', {'descricao': 'Cafe', 'quantidade': 2, 'valor': 12.9}),
+    ('Feijao 8,99', {'descricao': 'Feijao', 'quantidade': 1, 'valor': 8.99}),
+    ('Detergente', {'descricao': 'Detergente', 'quantidade': 1, 'valor': 0.0}),
+])
+def test_quantidade_no_inicio_da_linha(linha, esperado):
+    itens, erros = _extrair_itens_em_lote(linha)
+    assert erros == []
+    assert itens == [dict(esperado, linha=1)]
+
+
+def test_quantidade_zero_no_prefixo_e_erro():
+    itens, erros = _extrair_itens_em_lote('Pao\n0x Leite 4,50')
+    assert [i['descricao'] for i in itens] == ['Pao']
+    assert erros == [{'linha': 2, 'erro': 'Quantidade deve ser maior que zero.'}]
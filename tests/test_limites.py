@@ -0,0 +1,92 @@
+"""Token bucket (limitar_taxa), Retry-After e /metricas/limites."""
+import pytest
+from flask import session
+
+import app
+
+
+class Relogio:
+    def __init__(self, agora=1000.0):
+        self.agora = agora
+
+    def __call__(self):
+        return self.agora
+
+
+def test_calcular_bucket():
+    # Balde novo começa cheio.
+    assert app._calcular_bucket(None, 0, 3, 6, 50) == (3.0, 0.0)
+    # 6/min = 0,1 ficha/s: 10 s repõem uma ficha.
+    assert app._calcular_bucket(0.0, 100, 3, 6, 110) == pytest.approx((1.0, 0.0))
+    # Reposição limitada à capacidade.
+    assert app._calcular_bucket(2.0, 100, 3, 6, 1000) == (3.0, 0.0)
+    # Meia ficha: faltam 5 s para a próxima.
+    assert app._calcular_bucket(0.5, 100, 3, 6, 100) == pytest.approx((0.5, 5.0))
+
+
+@pytest.fixture(params=['memoria', 'sqlite'])
+def limitador(request, tmp_path):
+    relogio = Relogio()
+    if request.param == 'memoria':
+        return app.LimitadorMemoria(relogio), relogio
+    return app.LimitadorSQLite(str(tmp_path / 'limites.db'), relogio), relogio
+
+
+def test_consome_ate_esvaziar_e_repoe_com_o_tempo(limitador):
+    limitador, relogio = limitador
+    regras = [('u:1', 3, 6)]
+    assert [limitador.consumir(regras)[0] for _ in range(3)] == [True, True, True]
+
+    permitido, espera = limitador.consumir(regras)
+    assert not permitido and espera == pytest.approx(10.0)
+
+    relogio.agora += 4
+    permitido, espera = limitador.consumir(regras)
+    assert not permitido and espera == pytest.approx(6.0)
+
+    relogio.agora += 6
+    assert limitador.consumir(regras)[0]
+    assert not limitador.consumir(regras)[0]
+
+
+def test_recusa_nao_consome_dos_outros_baldes(limitador):
+    limitador, _ = limitador
+    for _ in range(2):
+        assert limitador.consumir([('u:1', 2, 6), ('global', 3, 6)])[0]
+    # Usuário sem fichas: o balde global não pode perder a dele.
+    assert not limitador.consumir([('u:1', 2, 6), ('global', 3, 6)])[0]
+    assert limitador.consumir([('u:2', 2, 6), ('global', 3, 6)])[0]
+    assert not limitador.consumir([('u:3', 2, 6), ('global', 3, 6)])[0]
+
+
+def test_retry_after_arredonda_para_cima(monkeypatch):
+    relogio = Relogio()
+    monkeypatch.setattr(app, '_limitador', app.LimitadorMemoria(relogio))
+    rota = app.limitar_taxa('ocr')(lambda: 'ok')
+    capacidade, _ = app._LIMITES['ocr']['usuario']
+
+    with app.app.test_request_context(headers={'Accept': 'application/json'}):
+        session['user_id'] = 1
+        assert [rota() for _ in range(capacidade)] == ['ok'] * capacidade
+        relogio.agora += 2.5
+        resposta = rota()
+
+    assert resposta.status_code == 429
+    assert resposta.headers['Retry-After'] == '8'
+    assert resposta.get_json()['retry_after'] == 8
+
+
+def test_metricas_desligadas_sem_token(cliente, monkeypatch):
+    monkeypatch.delenv('METRICAS_TOKEN', raising=False)
+    assert cliente.get('/metricas/limites').status_code == 404
+
+
+def test_metricas_exigem_o_token(monkeypatch):
+    monkeypatch.setenv('METRICAS_TOKEN', 'segredo')
+    cliente = app.app.test_client()
+    assert cliente.get('/metricas/limites').status_code == 401
+    assert cliente.get('/metricas/limites', headers={'Authorization': 'Bearer outro'}).status_code == 401
+
+    resposta = cliente.get('/metricas/limites', headers={'Authorization': 'Bearer segredo'})
+    assert resposta.status_code == 200
+    assert resposta.get_json()['armazenamento'] == app._limitador.nome
@@ -0,0 +1,60 @@
+"""Arquivar, restaurar e excluir contas e listas em lote."""
+import pytest
+
+import app
+
+
+@pytest.fixture
+def contas(banco):
+    banco.tabelas[app.TABLE_CONTAS] = [
+        {'id': 1, 'user_id': 1, 'nome': 'Corrente', 'arquivada': False},
+        {'id': 2, 'user_id': 1, 'nome': 'Poupanca', 'arquivada': False},
+        {'id': 3, 'user_id': 2, 'nome': 'De outro usuario', 'arquivada': False},
+    ]
+    return banco.tabelas[app.TABLE_CONTAS]
+
+
+def _mensagens(cliente):
+    with cliente.session_transaction() as sessao:
+        return sessao.get('_flashes', [])
+
+
+def test_arquivar_so_afeta_contas_do_usuario(cliente, contas):
+    resposta = cliente.post('/contas/lote', data={'acao': 'arquivar', 'ids': ['1', '3', 'x', '1']})
+
+    assert resposta.status_code == 302
+    assert [c['arquivada'] for c in contas] == [True, False, False]
+    assert _mensagens(cliente) == [('success', '1 conta(s) arquivada(s).')]
+
+
+def test_excluir_listas_usa_a_rpc_com_o_usuario_da_sessao(cliente, banco):
+    banco.funcoes['p01cf_excluir_listas'] = lambda params: len(params['p_ids'])
+
+    cliente.post('/listas/lote', data={'acao': 'deletar', 'ids': ['7', '8']})
+
+    assert banco.rpcs == [('p01cf_excluir_listas', {'p_user_id': 1, 'p_ids': [7, 8]})]
+    assert _mensagens(cliente) == [('success', '2 lista(s) excluida(s).')]
+
+
+@pytest.mark.parametrize('dados', [
+    {'acao': 'apagar_tudo', 'ids': ['1']},
+    {'ids': ['1']},
+    {'acao': 'arquivar'},
+    {'acao': 'arquivar', 'ids': ['abc']},
+])
+def test_acao_invalida_ou_selecao_vazia(cliente, contas, dados):
+    cliente.post('/contas/lote', data=dados)
+
+    assert not any(c['arquivada'] for c in contas)
+    assert _mensagens(cliente)[0][0] == 'warning'
+
+
+def test_selecao_acima_do_limite_nao_aplica_nada(cliente, banco):
+    banco.funcoes['p01cf_excluir_contas'] = lambda params: len(params['p_ids'])
+    ids = [str(n) for n in range(1, app._MAX_ITENS_LOTE + 2)]
+
+    cliente.post('/contas/lote', data={'acao': 'deletar', 'ids': ids})
+
+    assert banco.rpcs == []
+    categoria, mensagem = _mensagens(cliente)[0]
+    assert categoria == 'danger' and str(app._MAX_ITENS_LOTE) in mensagem
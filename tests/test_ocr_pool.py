@@ -0,0 +1,53 @@
+"""Recuperação do pool de OCR (processo morto e tempo esgotado)."""
+import time
+
+import pytest
+
+import app
+
+
+def _texto_fixo(conteudo, suffix, pagina=0):
+    return 'Leite 4,50'
+
+
+def _lento(conteudo, suffix, pagina=0):
+    time.sleep(60)
+
+
+@pytest.fixture
+def pool_limpo(monkeypatch):
+    monkeypatch.setattr(app, '_OCR_MAX_PROCESSOS', 1)
+    app._ocr_pool = None
+    yield
+    if app._ocr_pool is not None:
+        app._descartar_ocr_pool(app._ocr_pool)
+
+
+def test_pool_quebrado_e_recriado(pool_limpo, monkeypatch):
+    monkeypatch.setattr(app, 'ocr_texto_pagina', _texto_fixo)
+    pool = app._get_ocr_pool()
+    pool.submit(_texto_fixo, b'', '.jpg').result(timeout=60)
+    for processo in list(pool._processes.values()):
+        processo.kill()
+        processo.join()
+
+    itens = app._extrair_itens_por_ocr([(b'img', 'nota.jpg')])
+
+    assert itens == [{'descricao': 'Leite', 'quantidade': 1, 'valor': 4.5}]
+    assert app._ocr_pool is not pool
+
+
+def test_tempo_esgotado_encerra_o_pool(pool_limpo, monkeypatch):
+    monkeypatch.setattr(app, 'ocr_texto_pagina', _lento)
+    monkeypatch.setattr(app, '_OCR_TIMEOUT', 1)
+    pool = app._get_ocr_pool()
+    pool.submit(_texto_fixo, b'', '.jpg').result(timeout=60)
+    processos = list(pool._processes.values())
+
+    with pytest.raises(RuntimeError, match='Tempo esgotado'):
+        app._extrair_itens_por_ocr([(b'img', 'nota.jpg')])
+
+    assert app._ocr_pool is None
+    for processo in processos:
+        processo.join(timeout=5)
+        assert not processo.is_alive()
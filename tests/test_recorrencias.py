@@ -0,0 +1,108 @@
+"""Datas das transações recorrentes e o comando materializar-recorrencias."""
+from datetime import date
+
+import pytest
+from click.testing import CliRunner
+
+import app
+
+
+@pytest.mark.parametrize('data, meses, dia, esperado', [
+    (date(2026, 1, 31), 1, 31, date(2026, 2, 28)),
+    (date(2028, 1, 31), 1, 31, date(2028, 2, 29)),
+    (date(2026, 2, 28), 1, 31, date(2026, 3, 31)),
+    (date(2026, 3, 31), 1, 31, date(2026, 4, 30)),
+    (date(2026, 12, 15), 1, 15, date(2027, 1, 15)),
+    (date(2028, 2, 29), 12, 29, date(2029, 2, 28)),
+    (date(2029, 2, 28), 12, 29, date(2030, 2, 28)),
+])
+def test_somar_meses_ajusta_ao_fim_do_mes(data, meses, dia, esperado):
+    assert app._somar_meses(data, meses, dia) == esperado
+
+
+def test_primeira_data_no_mes_ou_no_seguinte():
+    assert app.primeira_data_recorrencia(date(2026, 1, 10), 31, 'mensal') == date(2026, 1, 31)
+    assert app.primeira_data_recorrencia(date(2026, 1, 10), 5, 'mensal') == date(2026, 2, 5)
+    assert app.primeira_data_recorrencia(date(2026, 3, 10), 5, 'anual') == date(2027, 3, 5)
+
+
+def _regra(**campos):
+    return dict({'id': 1, 'proxima_data': '2026-01-31', 'dia': 31, 'frequencia': 'mensal',
+                 'data_fim': None}, **campos)
+
+
+def test_dia_31_mantido_depois_de_fevereiro():
+    datas, proxima, ativa = app.ocorrencias_devidas(_regra(), date(2026, 5, 1))
+    assert datas == [date(2026, 1, 31), date(2026, 2, 28), date(2026, 3, 31), date(2026, 4, 30)]
+    assert proxima == date(2026, 5, 31) and ativa
+
+
+def test_fevereiro_de_ano_bissexto():
+    datas, _, _ = app.ocorrencias_devidas(_regra(proxima_data='2028-01-31'), date(2028, 3, 1))
+    assert datas == [date(2028, 1, 31), date(2028, 2, 29)]
+
+
+def test_ate_antes_da_proxima_data_nao_lanca_nada():
+    datas, proxima, ativa = app.ocorrencias_devidas(_regra(), date(2026, 1, 30))
+    assert datas == [] and proxima == date(2026, 1, 31) and ativa
+
+
+def test_data_fim_encerra_a_regra():
+    datas, proxima, ativa = app.ocorrencias_devidas(
+        _regra(data_fim='2026-03-15'), date(2026, 12, 31))
+    assert datas == [date(2026, 1, 31), date(2026, 2, 28)]
+    assert proxima == date(2026, 3, 31) and not ativa
+
+
+def test_limite_de_ocorrencias_por_execucao():
+    datas, proxima, ativa = app.ocorrencias_devidas(
+        _regra(proxima_data='1990-01-31'), date(2030, 1, 1))
+    assert len(datas) == app._RECORRENCIA_MAX_OCORRENCIAS
+    assert proxima == date(2000, 1, 31) and ativa
+
+
+@pytest.fixture
+def recorrencias(banco):
+    """p01cf_lancar_recorrencias em memória: (regra, competência) é única."""
+    banco.tabelas[app.TABLE_RECORRENCIAS] = [
+        {'id': 1, 'user_id': 1, 'conta_id': 1, 'tipo': 'saida', 'valor': '1200.00',
+         'descricao': 'Aluguel', 'dia': 31, 'frequencia': 'mensal',
+         'proxima_data': '2026-01-31', 'data_fim': None, 'ativa': True},
+        {'id': 2, 'user_id': 1, 'conta_id': 1, 'tipo': 'entrada', 'valor': '5000.00',
+         'descricao': 'Salario', 'dia': 5, 'frequencia': 'mensal',
+         'proxima_data': '2026-02-05', 'data_fim': None, 'ativa': True},
+    ]
+    lancadas = set()
+
+    def lancar(params):
+        novas = 0
+        for l in params['p_lancamentos']:
+            chave = (l['recorrencia_id'], l['competencia'])
+            if chave not in lancadas:
+                lancadas.add(chave)
+                novas += 1
+        for p in params['p_proximas']:
+            regra = next(r for r in banco.tabelas[app.TABLE_RECORRENCIAS] if r['id'] == p['id'])
+            regra.update(proxima_data=p['proxima_data'], ativa=p['ativa'])
+        return novas
+
+    banco.funcoes['p01cf_lancar_recorrencias'] = lancar
+    return lancadas
+
+
+def test_reexecucao_nao_duplica(banco, recorrencias):
+    runner = CliRunner()
+    primeira = runner.invoke(app.app.cli, ['materializar-recorrencias', '--ate', '2026-03-31', '--lote', '2'])
+    assert primeira.exit_code == 0, primeira.output
+    assert '5 transacoes' in primeira.output
+    assert sorted(recorrencias) == [
+        (1, '2026-01-31'), (1, '2026-02-28'), (1, '2026-03-31'), (2, '2026-02-05'), (2, '2026-03-05'),
+    ]
+    # --lote 2: cada regra vai inteira num lote, então são duas chamadas.
+    assert len(banco.rpcs) == 2
+
+    segunda = runner.invoke(app.app.cli, ['materializar-recorrencias', '--ate', '2026-03-31'])
+    assert segunda.exit_code == 0
+    assert '0 transacoes' in segunda.output
+    assert len(recorrencias) == 5
+
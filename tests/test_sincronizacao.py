@@ -0,0 +1,94 @@
+"""Fila offline de itens: /lista/<id>/itens/sincronizar."""
+import pytest
+
+import app
+
+BASE = {'descricao': 'Leite', 'quantidade': 1, 'valor': 4.5}
+
+
+@pytest.mark.parametrize('op, mensagem', [
+    ({'op': 'adicionar', 'descricao': 'Pao', 'quantidade': 1, 'valor': 1}, 'cliente_id'),
+    ({'op': 'editar', 'cliente_id': 'c1', 'id': 5, 'descricao': 'Pao', 'quantidade': 1, 'valor': 1},
+     'versao base'),
+    ({'op': 'deletar', 'cliente_id': 'c1', 'id': 5}, 'versao base'),
+    ({'op': 'adicionar', 'cliente_id': 'c1', 'descricao': 'Pao', 'quantidade': 1, 'valor': '-1'},
+     'negativo'),
+    ({'op': 'adicionar', 'cliente_id': 'c1', 'descricao': '  ', 'quantidade': 1, 'valor': 1},
+     'obrigatoria'),
+    ({'op': 'adicionar', 'cliente_id': 'c1', 'descricao': 'Pao', 'quantidade': 0, 'valor': 1},
+     'Quantidade'),
+    ({'op': 'renomear', 'cliente_id': 'c1'}, 'desconhecida'),
+    ('adicionar', 'desconhecida'),
+])
+def test_operacao_malformada(op, mensagem):
+    with pytest.raises(ValueError, match=mensagem):
+        app._normalizar_operacao_sync(op)
+
+
+def test_base_e_descricao_normalizadas():
+    op = app._normalizar_operacao_sync({
+        'op': 'editar', 'cliente_id': 'c1', 'id': '7',
+        'descricao': ' Leite integral ', 'quantidade': '2', 'valor': '4.50',
+        'base': {'descricao': ' Leite ', 'quantidade': 1, 'valor': '4.5'},
+    })
+    assert op == {
+        'op': 'editar', 'cliente_id': 'c1', 'id': 7,
+        'descricao': 'Leite integral', 'quantidade': 2, 'valor': 4.5,
+        'base': BASE,
+    }
+
+
+@pytest.mark.parametrize('corpo', [{}, {'operacoes': []}, {'operacoes': 'x'}])
+def test_sem_operacoes_400(cliente, corpo):
+    assert cliente.post('/lista/3/itens/sincronizar', json=corpo).status_code == 400
+
+
+def test_lote_grande_demais_413(cliente, banco):
+    operacoes = [{'op': 'deletar', 'cliente_id': str(n), 'id': n, 'base': BASE}
+                 for n in range(app._MAX_ITENS_LOTE + 1)]
+    resposta = cliente.post('/lista/3/itens/sincronizar', json={'operacoes': operacoes})
+    assert resposta.status_code == 413
+    assert banco.rpcs == []
+
+
+def test_invalidos_junto_com_resultados_do_banco(cliente, banco, monkeypatch):
+    registrados = []
+    monkeypatch.setattr(app, 'registrar_no_catalogo', lambda uid, itens: registrados.append((uid, itens)))
+    banco.funcoes['p01cf_sincronizar_itens'] = lambda params: [
+        {'cliente_id': 'novo', 'status': 'ok', 'id': 10},
+        {'cliente_id': 'reenvio', 'status': 'ok', 'id': 11, 'repetido': True},
+        {'cliente_id': 'edicao', 'status': 'conflito', 'id': 5, 'atual': None},
+        {'cliente_id': 'remocao', 'status': 'ok', 'id': 6},
+    ]
+    operacoes = [
+        {'op': 'adicionar', 'cliente_id': 'novo', 'descricao': 'Cafe', 'quantidade': 1, 'valor': 12},
+        {'op': 'adicionar', 'cliente_id': 'ruim', 'descricao': 'Cafe', 'quantidade': 1, 'valor': -3},
+        {'op': 'adicionar', 'cliente_id': 'reenvio', 'descricao': 'Pao', 'quantidade': 1, 'valor': 1},
+        {'op': 'editar', 'cliente_id': 'edicao', 'id': 5, 'descricao': 'Leite', 'quantidade': 2,
+         'valor': 4.5, 'base': BASE},
+        {'op': 'deletar', 'cliente_id': 'remocao', 'id': 6, 'base': BASE},
+        {'op': 'sumir', 'cliente_id': 'estranha'},
+    ]
+
+    resposta = cliente.post('/lista/3/itens/sincronizar', json={'operacoes': operacoes})
+
+    assert resposta.status_code == 200
+    resultados = resposta.get_json()['resultados']
+    assert [(r['cliente_id'], r['status']) for r in resultados] == [
+        ('ruim', 'invalido'), ('estranha', 'invalido'),
+        ('novo', 'ok'), ('reenvio', 'ok'), ('edicao', 'conflito'), ('remocao', 'ok'),
+    ]
+    (funcao, params), = banco.rpcs
+    assert funcao == 'p01cf_sincronizar_itens'
+    assert [op['cliente_id'] for op in params['p_operacoes']] == ['novo', 'reenvio', 'edicao', 'remocao']
+    # Só o que foi gravado agora (sem repetidos, conflitos ou remoções) vai ao catálogo.
+    assert [(uid, [i['cliente_id'] for i in itens]) for uid, itens in registrados] == [(1, ['novo'])]
+
+
+def test_lista_indisponivel_409(cliente, banco):
+    def falha(params):
+        raise RuntimeError('Lista 3 inexistente ou concluida')
+    banco.funcoes['p01cf_sincronizar_itens'] = falha
+    operacoes = [{'op': 'deletar', 'cliente_id': 'c1', 'id': 6, 'base': BASE}]
+    resposta = cliente.post('/lista/3/itens/sincronizar', json={'operacoes': operacoes})
+    assert resposta.status_code == 409